@@ -24,23 +24,31 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x1b\x63ontracts/proto/model.proto\x12\x05model\"5\n\x0fGenerateRequest\x12\x0e\n\x06prompt\x18\x01 \x01(\t\x12\x12\n\nmax_tokens\x18\x02 \x01(\x05\" \n\x10GenerateResponse\x12\x0c\n\x04text\x18\x01 \x01(\t\"1\n\x10\x45mbeddingRequest\x12\r\n\x05texts\x18\x01 \x03(\t\x12\x0e\n\x06prefix\x18\x02 \x01(\t\"9\n\x11\x45mbeddingResponse\x12$\n\nembeddings\x18\x01 \x03(\x0b\x32\x10.model.Embedding\"\x1b\n\tEmbedding\x12\x0e\n\x06vector\x18\x01 \x03(\x02\x32\x87\x01\n\x0cModelService\x12;\n\x08Generate\x12\x16.model.GenerateRequest\x1a\x17.model.GenerateResponse\x12:\n\x05\x45mbed\x12\x17.model.EmbeddingRequest\x1a\x18.model.EmbeddingResponseb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\x1b\x63ontracts/proto/model.proto\x12\x05model\"X\n\x0fGenerateRequest\x12\x0e\n\x06prompt\x18\x01 \x01(\t\x12\x12\n\nmax_tokens\x18\x02 \x01(\x05\x12!\n\x08priority\x18\x03 \x01(\x0e\x32\x0f.model.Priority\" \n\x10GenerateResponse\x12\x0c\n\x04text\x18\x01 \x01(\t\"\x1d\n\rGenerateChunk\x12\x0c\n\x04text\x18\x01 \x01(\t\"}\n\x10\x45mbeddingRequest\x12\r\n\x05texts\x18\x01 \x03(\t\x12\x0e\n\x06prefix\x18\x02 \x01(\t\x12\'\n\x08\x65ncoding\x18\x03 \x01(\x0e\x32\x15.model.VectorEncoding\x12!\n\x08priority\x18\x04 \x01(\x0e\x32\x0f.model.Priority\"a\n\x11\x45mbeddingResponse\x12$\n\nembeddings\x18\x01 \x03(\x0b\x32\x10.model.Embedding\x12&\n\x06matrix\x18\x02 \x01(\x0b\x32\x16.model.EmbeddingMatrix\"T\n\x0f\x45mbeddingMatrix\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x12\r\n\x05shape\x18\x02 \x03(\x05\x12$\n\x05\x64type\x18\x03 \x01(\x0e\x32\x15.model.VectorEncoding\"\x1b\n\tEmbedding\x12\x0e\n\x06vector\x18\x01 \x03(\x02*%\n\x08Priority\x12\x0f\n\x0bINTERACTIVE\x10\x00\x12\x08\n\x04\x42ULK\x10\x01*:\n\x0eVectorEncoding\x12\x0e\n\nFLOAT_LIST\x10\x00\x12\x0b\n\x07\x46LOAT32\x10\x01\x12\x0b\n\x07\x46LOAT16\x10\x02\x32\xc9\x01\n\x0cModelService\x12;\n\x08Generate\x12\x16.model.GenerateRequest\x1a\x17.model.GenerateResponse\x12@\n\x0eGenerateStream\x12\x16.model.GenerateRequest\x1a\x14.model.GenerateChunk0\x01\x12:\n\x05\x45mbed\x12\x17.model.EmbeddingRequest\x1a\x18.model.EmbeddingResponseb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'contracts.proto.model_pb2', _globals)
 if not _descriptor._USE_C_DESCRIPTORS:
   DESCRIPTOR._loaded_options = None
+  _globals['_PRIORITY']._serialized_start=534
+  _globals['_PRIORITY']._serialized_end=571
+  _globals['_VECTORENCODING']._serialized_start=573
+  _globals['_VECTORENCODING']._serialized_end=631
   _globals['_GENERATEREQUEST']._serialized_start=38
-  _globals['_GENERATEREQUEST']._serialized_end=91
-  _globals['_GENERATERESPONSE']._serialized_start=93
-  _globals['_GENERATERESPONSE']._serialized_end=125
-  _globals['_EMBEDDINGREQUEST']._serialized_start=127
-  _globals['_EMBEDDINGREQUEST']._serialized_end=176
-  _globals['_EMBEDDINGRESPONSE']._serialized_start=178
-  _globals['_EMBEDDINGRESPONSE']._serialized_end=235
-  _globals['_EMBEDDING']._serialized_start=237
-  _globals['_EMBEDDING']._serialized_end=264
-  _globals['_MODELSERVICE']._serialized_start=267
-  _globals['_MODELSERVICE']._serialized_end=402
+  _globals['_GENERATEREQUEST']._serialized_end=126
+  _globals['_GENERATERESPONSE']._serialized_start=128
+  _globals['_GENERATERESPONSE']._serialized_end=160
+  _globals['_GENERATECHUNK']._serialized_start=162
+  _globals['_GENERATECHUNK']._serialized_end=191
+  _globals['_EMBEDDINGREQUEST']._serialized_start=193
+  _globals['_EMBEDDINGREQUEST']._serialized_end=318
+  _globals['_EMBEDDINGRESPONSE']._serialized_start=320
+  _globals['_EMBEDDINGRESPONSE']._serialized_end=417
+  _globals['_EMBEDDINGMATRIX']._serialized_start=419
+  _globals['_EMBEDDINGMATRIX']._serialized_end=503
+  _globals['_EMBEDDING']._serialized_start=505
+  _globals['_EMBEDDING']._serialized_end=532
+  _globals['_MODELSERVICE']._serialized_start=634
+  _globals['_MODELSERVICE']._serialized_end=835
 # @@protoc_insertion_point(module_scope)
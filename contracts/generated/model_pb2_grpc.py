@@ -39,6 +39,11 @@ class ModelServiceStub(object):
                 request_serializer=contracts_dot_proto_dot_model__pb2.GenerateRequest.SerializeToString,
                 response_deserializer=contracts_dot_proto_dot_model__pb2.GenerateResponse.FromString,
                 _registered_method=True)
+        self.GenerateStream = channel.unary_stream(
+                '/model.ModelService/GenerateStream',
+                request_serializer=contracts_dot_proto_dot_model__pb2.GenerateRequest.SerializeToString,
+                response_deserializer=contracts_dot_proto_dot_model__pb2.GenerateChunk.FromString,
+                _registered_method=True)
         self.Embed = channel.unary_unary(
                 '/model.ModelService/Embed',
                 request_serializer=contracts_dot_proto_dot_model__pb2.EmbeddingRequest.SerializeToString,
@@ -55,6 +60,14 @@ class ModelServiceServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def GenerateStream(self, request, context):
+        """Генерация с передачей текста по мере получения токенов,
+        при отмене вызова клиентом или истечении дедлайна генерация прекращается
+        """
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def Embed(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -69,6 +82,11 @@ def add_ModelServiceServicer_to_server(servicer, server):
                     request_deserializer=contracts_dot_proto_dot_model__pb2.GenerateRequest.FromString,
                     response_serializer=contracts_dot_proto_dot_model__pb2.GenerateResponse.SerializeToString,
             ),
+            'GenerateStream': grpc.unary_stream_rpc_method_handler(
+                    servicer.GenerateStream,
+                    request_deserializer=contracts_dot_proto_dot_model__pb2.GenerateRequest.FromString,
+                    response_serializer=contracts_dot_proto_dot_model__pb2.GenerateChunk.SerializeToString,
+            ),
             'Embed': grpc.unary_unary_rpc_method_handler(
                     servicer.Embed,
                     request_deserializer=contracts_dot_proto_dot_model__pb2.EmbeddingRequest.FromString,
@@ -112,6 +130,33 @@ class ModelService(object):
             metadata,
             _registered_method=True)
 
+    @staticmethod
+    def GenerateStream(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(
+            request,
+            target,
+            '/model.ModelService/GenerateStream',
+            contracts_dot_proto_dot_model__pb2.GenerateRequest.SerializeToString,
+            contracts_dot_proto_dot_model__pb2.GenerateChunk.FromString,
+            options,
+            channel_credentials,
+            insecure,
+            call_credentials,
+            compression,
+            wait_for_ready,
+            timeout,
+            metadata,
+            _registered_method=True)
+
     @staticmethod
     def Embed(request,
             target,
@@ -1,10 +1,20 @@
+from typing import AsyncIterator, Optional
+import asyncio
+import time
 import grpc
+import numpy as np
 from concurrent import futures
 
 from contracts.generated import model_pb2, model_pb2_grpc
 
 from model_service.service.inference.embedding import EmbeddingModel
-from model_service.service.inference.llm import LLMModel
+from model_service.service.inference.embedding_cache import EmbeddingCache, model_fingerprint
+from model_service.service.inference.llm_pool import (
+    LLMWorkerPool, LLMQueueFullError, LLMDeadlineError, LLMUnavailableError
+)
+from model_service.service.inference.llm_cache import GenerationCache, generation_fingerprint, is_deterministic
+from model_service.service.inference.batching import EmbeddingBatcher
+from model_service.service.inference.priority import Priority
 
 from model_service.service.logging_config import setup_logging
 from model_service.service.config import Config
@@ -14,6 +24,34 @@ setup_logging()  # настройка логирования
 log = logging.getLogger(__name__)
 config = Config()
 
+# Типы numpy для упакованных эмбеддингов (little-endian)
+MATRIX_DTYPES = {
+    model_pb2.FLOAT32: np.dtype("<f4"),                    # type: ignore
+    model_pb2.FLOAT16: np.dtype("<f2"),                    # type: ignore
+}
+# Классы приоритета запросов
+PRIORITIES = {
+    model_pb2.INTERACTIVE: Priority.INTERACTIVE,           # type: ignore
+    model_pb2.BULK: Priority.BULK,                         # type: ignore
+}
+# Метаданные отказа по дедлайну: сервис поиска не повторяет такие запросы,
+# повтор с тем же таймаутом только добавил бы нагрузку перегруженному сервису
+SHED_METADATA = (("load-shed", "deadline"),)
+
+
+def client_deadline(context: grpc.aio.ServicerContext) -> Optional[float]:
+    """
+    Дедлайн вызова клиента.
+
+    Args:
+        context: grpc.aio.ServicerContext — служебный объект gRPC.
+
+    Returns:
+        Optional[float]: Дедлайн (time.time()), None - клиент не задал таймаут.
+    """
+    remaining = context.time_remaining()
+    return None if remaining is None else time.time() + remaining
+
 
 class ModelService(model_pb2_grpc.ModelServiceServicer):
     """
@@ -22,68 +60,220 @@ class ModelService(model_pb2_grpc.ModelServiceServicer):
     Предоставляет методы для:
     - генерации текста с помощью LLM
     - получения эмбеддингов текста
+
+    Обработчики выполняются в event loop и не занимают потоков во время ожидания:
+    эмбеддинги считаются в потоке батчера, ответы Embed формируются в отдельном
+    пуле потоков, генерация выполняется в процессах пула LLM. Поэтому долгие
+    генерации не задерживают эмбеддинги поисковых запросов.
     """
 
     def __init__(self):
         """Инициализация моделей эмбеддингов и LLM."""
+        # Повторные тексты (в т.ч. после перезапуска) не пересчитываются моделью
+        self.embedding_cache = None
+        if config.embedding["cache"]["path"]:
+            self.embedding_cache = EmbeddingCache(
+                path=config.embedding["cache"]["path"],
+                fingerprint=model_fingerprint(
+                    model_path=config.embedding["path"],
+                    file_name=config.embedding["model_name"],
+                    max_length=config.embedding["max_length"],
+                ),
+                max_size_mb=config.embedding["cache"]["max_size_mb"],
+            )
+
         self.embedding_model = EmbeddingModel(
             model_path=config.embedding["path"],
             file_name=config.embedding["model_name"],
             batch_size=config.embedding["batch_size"],
             max_length=config.embedding["max_length"],
+            cache=self.embedding_cache,
+        )
+
+        # Запросы из разных потоков объединяются в общие батчи
+        self.embedding_batcher = EmbeddingBatcher(
+            model=self.embedding_model,
+            max_batch_size=config.embedding["batching"]["max_batch_size"],
+            max_wait_ms=config.embedding["batching"]["max_wait_ms"],
+            bulk_max_batch_size=config.embedding["batching"]["bulk_max_batch_size"],
+        )
+
+        # Формирование ответов Embed (сериализация эмбеддингов) вне event loop
+        self.embedding_executor = futures.ThreadPoolExecutor(
+            max_workers=config.service["embedding_workers"],
+            thread_name_prefix="embedding-response",
         )
 
-        self.llm_model = LLMModel(
-            model_path=config.llm["path"],
-            n_ctx=config.llm["n_ctx"],
-            threads=config.llm["n_threads"],
-            generate_params=config.llm["generate"]
+        llm_params = {
+            "model_path": config.llm["path"],
+            "n_ctx": config.llm["n_ctx"],
+            "threads": config.llm["n_threads"],
+            "generate_params": config.llm["generate"],
+            "prompt_prefix": config.llm["prompt_prefix"],
+        }
+
+        # Результат жадной генерации зависит только от промпта, модели и параметров
+        generation_cache = None
+        if config.llm["cache"]["path"]:
+            if is_deterministic(config.llm["generate"]):
+                generation_cache = GenerationCache(
+                    path=config.llm["cache"]["path"],
+                    fingerprint=generation_fingerprint(llm_params),
+                    max_size_mb=config.llm["cache"]["max_size_mb"],
+                )
+            else:
+                log.warning("Generation cache disabled: generation is not deterministic (temperature > 0 and top_k > 1)")
+
+        # Каждый воркер - отдельный процесс со своим экземпляром LLM
+        self.llm_pool = LLMWorkerPool(
+            model_params=llm_params,
+            n_workers=config.llm["workers"]["n_workers"],
+            priorities=config.llm["workers"]["priorities"],
+            slots_per_worker=config.llm["workers"]["max_sequences"],
+            cache=generation_cache,
         )
 
-    def Generate(self,
-                 request: model_pb2.GenerateRequest,      # type: ignore
-                 context: grpc.ServicerContext
-                 ) -> model_pb2.GenerateResponse:         # type: ignore
+    async def Generate(self,
+                       request: model_pb2.GenerateRequest,      # type: ignore
+                       context: grpc.aio.ServicerContext
+                       ) -> model_pb2.GenerateResponse:         # type: ignore
         """
         Генерация текста на основе входного промпта.
 
         Args:
             request: Объект запроса gRPC, содержащий:
                 - prompt (str): входной текст для генерации
-            context: grpc.ServicerContext — служебный объект gRPC,
+                - priority (Priority): класс приоритета запроса
+            context: grpc.aio.ServicerContext — служебный объект gRPC,
                 предоставляющий доступ к метаданным запроса,
                 управлению статусами, таймаутами и отменой вызова.
 
         Returns:
             model_pb2.GenerateResponse: объект с сгенерированным текстом.
+                При заполненной очереди класса приоритета запрос отклоняется со статусом RESOURCE_EXHAUSTED,
+                если генерация не успеет завершиться до дедлайна клиента - со статусом DEADLINE_EXCEEDED
+                и метаданными SHED_METADATA, если ни один воркер LLM не запускается - со статусом UNAVAILABLE.
         """
-        result = self.llm_model.generate(
-            request.prompt,
-        )
+        try:
+            # Если клиент отменил вызов или истек дедлайн, корутина отменяется и генерация прекращается
+            result = await self.llm_pool.generate(
+                request.prompt,
+                priority=PRIORITIES.get(request.priority, Priority.BULK),
+                deadline=client_deadline(context),
+            )
+        except LLMQueueFullError as e:
+            log.warning(f"Generate rejected: {e}")
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, str(e))
+        except LLMDeadlineError as e:
+            log.warning(f"Generate shed: {e}")
+            await context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, str(e), SHED_METADATA)
+        except LLMUnavailableError as e:
+            log.error(f"Generate failed: {e}")
+            await context.abort(grpc.StatusCode.UNAVAILABLE, str(e))
 
         return model_pb2.GenerateResponse(text=result)    # type: ignore
 
-    def Embed(self,
-              request: model_pb2.EmbeddingRequest,        # type: ignore
-              context: grpc.ServicerContext
-              ) -> model_pb2.EmbeddingResponse:           # type: ignore
+    async def GenerateStream(self,
+                             request: model_pb2.GenerateRequest,  # type: ignore
+                             context: grpc.aio.ServicerContext
+                             ) -> AsyncIterator[model_pb2.GenerateChunk]:  # type: ignore
+        """
+        Генерация текста с передачей клиенту по мере получения токенов.
+
+        Args:
+            request: Объект запроса gRPC, содержащий:
+                - prompt (str): входной текст для генерации
+                - priority (Priority): класс приоритета запроса
+            context: grpc.aio.ServicerContext — служебный объект gRPC
+                для управления статусом вызова.
+
+        Returns:
+            AsyncIterator[model_pb2.GenerateChunk]: части сгенерированного текста.
+                При отмене вызова клиентом или истечении дедлайна генерация прекращается.
+        """
+        try:
+            async for text in self.llm_pool.stream(
+                request.prompt,
+                priority=PRIORITIES.get(request.priority, Priority.BULK),
+                deadline=client_deadline(context),
+            ):
+                yield model_pb2.GenerateChunk(text=text)  # type: ignore
+        except LLMQueueFullError as e:
+            log.warning(f"GenerateStream rejected: {e}")
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, str(e))
+        except LLMDeadlineError as e:
+            log.warning(f"GenerateStream shed: {e}")
+            await context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, str(e), SHED_METADATA)
+        except LLMUnavailableError as e:
+            log.error(f"GenerateStream failed: {e}")
+            await context.abort(grpc.StatusCode.UNAVAILABLE, str(e))
+
+    async def Embed(self,
+                    request: model_pb2.EmbeddingRequest,        # type: ignore
+                    context: grpc.aio.ServicerContext
+                    ) -> model_pb2.EmbeddingResponse:           # type: ignore
         """
         Получение эмбеддингов для списка текстов.
 
         Args:
             request: Объект запроса gRPC, содержащий:
                 - texts (Iterable[str]): список текстов
-            context: grpc.ServicerContext — служебный объект gRPC
+                - encoding (VectorEncoding): формат эмбеддингов в ответе
+                - priority (Priority): класс приоритета запроса
+            context: grpc.aio.ServicerContext — служебный объект gRPC
                 (может использоваться для обработки ошибок, таймаутов и метаданных).
 
         Returns:
             model_pb2.EmbeddingResponse: объект со списком эмбеддингов,
-                где каждый эмбеддинг представлен как список чисел.
+                где каждый эмбеддинг представлен как список чисел,
+                либо (request.encoding FLOAT32/FLOAT16) с матрицей эмбеддингов одним буфером.
+                Вызов с уже истекшим дедлайном отклоняется со статусом DEADLINE_EXCEEDED
+                и метаданными SHED_METADATA.
         """
-        embeddings = self.embedding_model.embed(
-            texts=list(request.texts),  # request.texts - объект protobuf, преобразовываем в список обратно
+        deadline = client_deadline(context)
+        if deadline is not None and deadline <= time.time():
+            log.warning("Embed shed: deadline expired before processing")
+            await context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, "Deadline expired before processing", SHED_METADATA)
+
+        # Ожидание общего батча без блокировки потока, при отмене вызова запрос исключается из батча
+        embeddings = await asyncio.wrap_future(
+            self.embedding_batcher.submit(
+                texts=list(request.texts),  # request.texts - объект protobuf, преобразовываем в список обратно
+                priority=PRIORITIES.get(request.priority, Priority.BULK),
+            )
         )
 
+        return await asyncio.get_running_loop().run_in_executor(
+            self.embedding_executor,
+            self._embedding_response,
+            embeddings,
+            request.encoding,
+        )
+
+    @staticmethod
+    def _embedding_response(embeddings: np.ndarray,
+                            encoding: int) -> model_pb2.EmbeddingResponse:  # type: ignore
+        """
+        Формирование ответа с эмбеддингами в запрошенном формате.
+
+        Args:
+            embeddings (np.ndarray): Эмбеддинги текстов
+            encoding (VectorEncoding): Формат эмбеддингов в ответе
+
+        Returns:
+            model_pb2.EmbeddingResponse: Эмбеддинги списками чисел или матрицей одним буфером.
+        """
+        dtype = MATRIX_DTYPES.get(encoding)
+        if dtype is not None:
+            # Упакованный буфер без создания python-объектов на каждое число
+            return model_pb2.EmbeddingResponse(           # type: ignore
+                matrix=model_pb2.EmbeddingMatrix(         # type: ignore
+                    data=np.ascontiguousarray(embeddings, dtype=dtype).tobytes(),
+                    shape=list(embeddings.shape),
+                    dtype=encoding,
+                )
+            )
+
         response_embeddings = []
 
         for emb in embeddings:
@@ -95,31 +285,63 @@ class ModelService(model_pb2_grpc.ModelServiceServicer):
             embeddings=response_embeddings
         )
 
+    def stats(self) -> dict:
+        """
+        Метрики сервиса.
+
+        Returns:
+            dict: Состояние пула LLM (очереди, ожидание и генерация, кэш генерации)
+                и метрики кэша эмбеддингов.
+        """
+        return {
+            "llm": self.llm_pool.stats(),
+            "embedding_cache": self.embedding_cache.stats() if self.embedding_cache is not None else None,
+        }
 
-def serve():
+
+async def log_stats(service: ModelService, interval: float):
     """
-    Запуск gRPC сервера.
+    Периодическая запись метрик сервиса в лог.
 
-    Создаёт пул потоков, регистрирует сервис ModelService
-    и начинает прослушивание на порту 50051.
+    Args:
+        service (ModelService): Сервис моделей.
+        interval (float): Интервал записи в секундах.
     """
-    server = grpc.server(
-        futures.ThreadPoolExecutor(
-            max_workers=config.service["max_workers"]
-        )
-    )
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        # Метрики кэшей собираются под их блокировками, вне event loop
+        stats = await loop.run_in_executor(None, service.stats)
+        log.info(f"Model service stats: {stats}")
 
+
+async def serve():
+    """
+    Запуск асинхронного gRPC сервера.
+
+    Регистрирует сервис ModelService и начинает прослушивание на порту 50051.
+    Потоки обработчиков не используются: эмбеддинги и генерация выполняются
+    в собственных пулах (батчер и embedding_workers, процессы пула LLM).
+    """
+    server = grpc.aio.server()
+
+    service = ModelService()
     model_pb2_grpc.add_ModelServiceServicer_to_server(
-        ModelService(), server
+        service, server
     )
 
     server.add_insecure_port("[::]:50051")
 
-    server.start()
+    await server.start()
     log.info("gRPC server started on 50051")
 
-    server.wait_for_termination()
+    # Event loop хранит только слабые ссылки на задачи, ссылки держим до завершения сервера
+    background = set()
+    if config.service.get("stats_interval"):
+        background.add(asyncio.create_task(log_stats(service, config.service["stats_interval"])))
+
+    await server.wait_for_termination()
 
 
 if __name__ == "__main__":
-    serve()
+    asyncio.run(serve())
@@ -0,0 +1,171 @@
+from typing import Deque, Dict, List, Tuple
+from collections import deque
+from concurrent.futures import Future
+import threading
+import time
+import numpy as np
+import logging
+
+from model_service.service.inference.embedding import EmbeddingModel
+from model_service.service.inference.priority import Priority
+
+log = logging.getLogger(__name__)
+
+
+class EmbeddingBatcher:
+    """
+    Динамический батчинг запросов на эмбеддинги.
+        Запросы из разных потоков gRPC сервера собираются в очередь,
+        отдельный поток объединяет их в один батч (не дольше max_wait
+        и не больше max_batch_size текстов), выполняет инференс
+        и раздает результаты обратно. Запросы interactive попадают в батч раньше bulk,
+        тексты bulk занимают в батче не больше bulk_max_batch_size
+    """
+    def __init__(self,
+                 model: EmbeddingModel,
+                 max_batch_size: int,
+                 max_wait_ms: float,
+                 bulk_max_batch_size: int = None):
+        """
+        Args:
+            model (EmbeddingModel): Эмбеддинг модель
+            max_batch_size (int): Максимальное количество текстов в батче
+            max_wait_ms (float): Максимальное время ожидания новых запросов в мс
+            bulk_max_batch_size (int, None): Максимальное количество текстов bulk-запросов в батче
+                (None - без отдельного ограничения)
+        """
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.limits = {
+            Priority.INTERACTIVE: max_batch_size,
+            Priority.BULK: bulk_max_batch_size or max_batch_size,
+        }
+
+        self._queues: Dict[Priority, Deque[Tuple[List[str], Future]]] = {p: deque() for p in Priority}
+        self._cond = threading.Condition()
+
+        self._thread = threading.Thread(
+            target=self._loop,
+            name="embedding-batcher",
+            daemon=True
+        )
+        self._thread.start()
+
+        log.info(
+            f"EmbeddingBatcher started: max_batch_size={max_batch_size}, max_wait_ms={max_wait_ms}, "
+            f"bulk_max_batch_size={self.limits[Priority.BULK]}"
+        )
+
+    def embed(self,
+              texts: List[str],
+              priority: Priority = Priority.INTERACTIVE) -> np.ndarray:
+        """
+        Получение эмбеддингов через общий батч (блокирует до получения результата)
+        Args:
+            texts (List[str]): Список текстов
+            priority (Priority): Класс приоритета запроса
+        Returns:
+            np.ndarray: Эмбеддинги текстов
+        """
+        return self.submit(texts, priority).result()
+
+    def submit(self,
+               texts: List[str],
+               priority: Priority = Priority.INTERACTIVE) -> Future:
+        """
+        Постановка текстов в очередь класса на получение эмбеддингов
+        Args:
+            texts (List[str]): Список текстов
+            priority (Priority): Класс приоритета запроса
+        Returns:
+            Future: Future с эмбеддингами текстов
+        """
+        future = Future()
+        with self._cond:
+            self._queues[priority].append((texts, future))
+            self._cond.notify()
+        return future
+
+    def _collect(self) -> List[Tuple[List[str], Future]]:
+        """
+        Сбор батча: первый запрос ждем без ограничения, остальные - не дольше max_wait.
+            Очереди просматриваются в порядке приоритета, запрос, не помещающийся
+            в ограничение своего класса, ждет следующего батча
+        """
+        batch = []
+        sizes = dict.fromkeys(Priority, 0)
+
+        with self._cond:
+            while not any(self._queues.values()):
+                self._cond.wait()
+            deadline = time.monotonic() + self.max_wait
+
+            while True:
+                for priority, pending in self._queues.items():
+                    while pending and self._fits(batch, sizes, priority, len(pending[0][0])):
+                        texts, future = pending.popleft()
+                        batch.append((texts, future))
+                        sizes[priority] += len(texts)
+
+                remaining = deadline - time.monotonic()
+                if sum(sizes.values()) >= self.max_batch_size or remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+
+        return batch
+
+    def _fits(self,
+              batch: List[Tuple[List[str], Future]],
+              sizes: Dict[Priority, int],
+              priority: Priority,
+              count: int) -> bool:
+        """Помещается ли запрос из count текстов в батч (первый запрос батча - всегда)"""
+        if not batch:
+            return True
+        return (sum(sizes.values()) + count <= self.max_batch_size
+                and sizes[priority] + count <= self.limits[priority])
+
+    def _run(self, batch: List[Tuple[List[str], Future]]):
+        """
+        Инференс батча и раздача результатов.
+            При ошибке инференса объединенного батча запросы выполняются по отдельности,
+            ошибкой завершаются только запросы, на которых она повторилась
+        """
+        batch = [(texts, future) for texts, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        texts = [text for request_texts, _ in batch for text in request_texts]
+        log.debug(f"Embedding batch: {len(batch)} requests, {len(texts)} texts")
+
+        try:
+            embeddings = self._embed(texts)
+        except Exception as e:
+            log.exception("Error during batched embedding")
+            if len(batch) == 1:
+                batch[0][1].set_exception(e)
+                return
+
+            # Ошибка одного запроса не должна завершать ошибкой остальные запросы батча
+            log.warning(f"Retrying {len(batch)} requests of failed embedding batch separately")
+            for request_texts, future in batch:
+                try:
+                    future.set_result(self._embed(request_texts))
+                except Exception as request_error:
+                    log.exception("Error during embedding")
+                    future.set_exception(request_error)
+            return
+
+        offset = 0
+        for request_texts, future in batch:
+            future.set_result(embeddings[offset:offset + len(request_texts)])
+            offset += len(request_texts)
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        """Инференс списка текстов"""
+        return self.model.embed(texts) if texts else np.empty((0, 0), dtype=np.float32)
+
+    def _loop(self):
+        while True:
+            self._run(self._collect())
@@ -1,4 +1,4 @@
-from typing import List, Any
+from typing import List, Optional
 import torch
 from torch import Tensor
 import torch.nn.functional as F
@@ -7,6 +7,8 @@ from transformers import AutoTokenizer
 import numpy as np
 import logging
 
+from model_service.service.inference.embedding_cache import EmbeddingCache
+
 log = logging.getLogger(__name__)
 
 
@@ -17,6 +19,7 @@ class EmbeddingModel:
                  file_name: str,
                  batch_size: int,
                  max_length=512,
+                 cache: Optional[EmbeddingCache] = None,
                  ):
         """
         Инициализация энкодера и токенайзера модели
@@ -25,6 +28,7 @@ class EmbeddingModel:
             file_name (str): Название модели
             batch_size (int): Размер батча
             max_length (int): Максимальная длина входа модели в токенах
+            cache (EmbeddingCache, None): Кэш эмбеддингов на диске, None - без кэша
         """
 
         log.info(f"Initializing EmbeddingModel: model_path={model_path}, file_name={file_name}")
@@ -44,6 +48,7 @@ class EmbeddingModel:
         log.info(f"Using device: {self.device}")
 
         self.batch_size = batch_size
+        self.cache = cache
 
     @staticmethod
     def mean_pooling(last_hidden_states: Tensor,
@@ -51,82 +56,65 @@ class EmbeddingModel:
         last_hidden = last_hidden_states.masked_fill(~attention_mask[..., None].bool(), 0.0)
         return last_hidden.sum(dim=1) / attention_mask.sum(dim=1)[..., None]
 
+    @staticmethod
     def weighted_pooling(
-            self,
-            chunks: List[str],
-            device: Any) -> Tensor:
+            lengths: Tensor,
+            owners: Tensor,
+            n_texts: int) -> Tensor:
         """
-        Вычисление весов чанков пропорционально их длине
+        Вычисление весов чанков пропорционально их длине (в пределах каждого текста)
         Args:
-            chunks (List[str]): Список текстовых чанков
-            device (Any): Device
+            lengths (Tensor): Длины чанков в токенах
+            owners (Tensor): Индекс текста для каждого чанка
+            n_texts (int): Количество текстов
         Returns:
             weights (Tensor): Веса чанков
         """
 
-        log.debug(f"Computing weights for {len(chunks)} chunks")
-
-        lengths = []
-        for chunk in chunks:
-            tokens = self.tokenizer(
-                chunk,
-                add_special_tokens=False
-            )["input_ids"]
-            lengths.append(len(tokens))
+        log.debug(f"Computing weights for {len(lengths)} chunks of {n_texts} texts")
 
-        lengths = torch.tensor(lengths, device=device, dtype=torch.float32)
+        text_lengths = torch.zeros(n_texts, device=lengths.device, dtype=torch.float32)
+        text_lengths.index_add_(0, owners, lengths)
 
-        if lengths.sum() == 0:
+        if (text_lengths == 0).any():
             log.warning("Sum of chunk lengths is zero — possible issue with input data")
 
-        # нормализуем веса
-        weights = lengths / (lengths.sum() + 1e-8)
+        # нормализуем веса в пределах текста
+        weights = lengths / (text_lengths[owners] + 1e-8)
 
         log.debug(f"Chunk weights: {weights.tolist()}")
 
         return weights
 
-    def chunk_text(
+    def chunk_tokens(
             self,
-            text: str,
+            token_ids: List[int],
             overlap: int = 50
-    ) -> List[str]:
+    ) -> List[List[int]]:
         """
-        Разбивает текст на чанки по токенам с перекрытием
+        Разбивает токены текста на окна с перекрытием.
+            Размер окна оставляет место для специальных токенов модели
         Args:
-            text (str): Полный текст проблемы
+            token_ids (List[int]): Токены текста (без специальных токенов)
             overlap (int): Перекрытие, часть токенов из предыдущего чанка
         Returns:
-            chunks (List[str]): Чанки текста
+            chunks (List[List[int]]): Чанки токенов
         """
 
-        log.debug(f"Chunking text with length {len(text)} characters")
-
-        tokens = self.tokenizer(
-            text,
-            add_special_tokens=False,
-            return_attention_mask=False,
-            return_tensors=None
-        )["input_ids"]
+        log.debug(f"Chunking text with length {len(token_ids)} tokens")
 
-        chunks = []
+        window = self.max_length - self.tokenizer.num_special_tokens_to_add(pair=False)
 
-        if len(tokens) <= self.max_length:
+        if len(token_ids) <= window:
             log.debug("Text fits into a single chunk")
-            return [text]
+            return [token_ids]
 
+        chunks = []
         start = 0
 
-        while start < len(tokens):
-            end = start + self.max_length
-            chunk_tokens = tokens[start:end]
-            chunk_text = self.tokenizer.decode(
-                chunk_tokens,
-                skip_special_tokens=True,
-                clean_up_tokenization_spaces=False
-            )
-            chunks.append(chunk_text)
-            start += self.max_length - overlap
+        while start < len(token_ids):
+            chunks.append(token_ids[start:start + window])
+            start += window - overlap
 
         log.info(f"Text split into {len(chunks)} chunks")
 
@@ -134,12 +122,12 @@ class EmbeddingModel:
 
     def _encode(
             self,
-            chunks: List[str],
+            chunks: List[List[int]],
     ) -> Tensor:
         """
-        Получение эмбеддинга для текстов
+        Получение эмбеддинга для чанков токенов
         Args:
-            chunks (List[str]):
+            chunks (List[List[int]]): Чанки токенов (без специальных токенов)
         Returns:
             Tensor: Полученный эмбеддинг
         """
@@ -152,11 +140,15 @@ class EmbeddingModel:
             batch_chunks = chunks[i:i + self.batch_size]
             log.debug(f"Processing batch {i // self.batch_size + 1} with size {len(batch_chunks)}")
 
-            batch = self.tokenizer(
-                batch_chunks,
+            # Токены подаются в модель напрямую, без повторной токенизации
+            batch = self.tokenizer.pad(
+                {
+                    "input_ids": [
+                        self.tokenizer.build_inputs_with_special_tokens(chunk)
+                        for chunk in batch_chunks
+                    ]
+                },
                 padding=True,
-                truncation=True,
-                max_length=self.max_length,
                 return_tensors="pt"
             )
 
@@ -183,42 +175,90 @@ class EmbeddingModel:
             self,
             texts: List[str]
     ) -> np.ndarray:
-
         """
-        Получение эмбеддинга для текстов
+        Получение эмбеддинга для текстов.
+            Эмбеддинги, найденные в кэше, не пересчитываются,
+            модель вызывается только для остальных текстов
         Args:
             texts (List): Список текстов
         Returns:
-            ndarray[list[Tensor]]: array полученных эмбеддингов
+            ndarray: array полученных эмбеддингов
         """
+        if self.cache is None:
+            return self._embed(texts)
 
-        log.info(f"Starting embedding for {len(texts)} texts")
-
-        all_embeddings = []
+        cached = self.cache.get_many(texts)
+        missing = [i for i, embedding in enumerate(cached) if embedding is None]
+        log.info(f"Embedding cache: {len(texts) - len(missing)} hits, {len(missing)} misses")
 
-        for idx, text in enumerate(texts):
-            log.debug(f"Processing text {idx + 1}/{len(texts)}")
+        if missing:
+            missing_texts = [texts[i] for i in missing]
+            computed = self._embed(missing_texts)
+            self.cache.put_many(missing_texts, computed)
+            for i, embedding in zip(missing, computed):
+                cached[i] = embedding
 
-            # делим текст на чанки
-            chunks = self.chunk_text(text)
-            log.debug(f"Number of chunks: {len(chunks)}")
+        return np.stack(cached)
 
-            # получаем эмбеддинги чанков
-            chunk_embeddings = self._encode(chunks)
+    def _embed(
+            self,
+            texts: List[str]
+    ) -> np.ndarray:
 
-            # weighted pooling
-            weights = self.weighted_pooling(
-                chunks,
-                chunk_embeddings.device
-            )
-            final_embedding = (chunk_embeddings * weights.unsqueeze(1)).sum(dim=0, keepdim=True)
+        """
+        Получение эмбеддинга для текстов моделью.
+            Чанки всех текстов обрабатываются вместе: сортируются по длине,
+            кодируются полными батчами и затем собираются обратно по текстам
+        Args:
+            texts (List): Список текстов
+        Returns:
+            ndarray[list[Tensor]]: array полученных эмбеддингов
+        """
 
-            # финальная нормализация
-            final_embedding = F.normalize(final_embedding, p=2, dim=-1)
+        log.info(f"Starting embedding for {len(texts)} texts")
 
-            all_embeddings.append(final_embedding)
+        # токенизируем все тексты один раз и делим токены на чанки
+        token_ids = self.tokenizer(
+            texts,
+            add_special_tokens=False,
+            return_attention_mask=False,
+        )["input_ids"]
 
-        result: np.ndarray = np.vstack([emb.cpu().numpy() for emb in all_embeddings])
+        chunks = []
+        owners = []
+        for idx, ids in enumerate(token_ids):
+            text_chunks = self.chunk_tokens(ids)
+            log.debug(f"Text {idx + 1}/{len(texts)}: number of chunks: {len(text_chunks)}")
+            chunks.extend(text_chunks)
+            owners.extend([idx] * len(text_chunks))
+
+        # вес чанка - его длина в токенах
+        lengths = [len(chunk) for chunk in chunks]
+
+        # сортируем чанки по длине, чтобы в батче были чанки близкой длины (меньше паддинга)
+        order = sorted(range(len(chunks)), key=lambda i: lengths[i])
+        encoded = self._encode([chunks[i] for i in order])
+
+        order = torch.tensor(order, device=encoded.device)
+        chunk_embeddings = torch.empty_like(encoded)
+        chunk_embeddings[order] = encoded
+
+        owners = torch.tensor(owners, device=encoded.device)
+        lengths = torch.tensor(lengths, device=encoded.device, dtype=torch.float32)
+
+        # weighted pooling
+        weights = self.weighted_pooling(lengths, owners, len(texts))
+        final_embeddings = torch.zeros(
+            (len(texts), chunk_embeddings.shape[1]),
+            device=encoded.device,
+            dtype=chunk_embeddings.dtype
+        )
+        final_embeddings.index_add_(0, owners, chunk_embeddings * weights.unsqueeze(1))
+
+        # финальная нормализация
+        final_embeddings = F.normalize(final_embeddings, p=2, dim=-1)
+
+        result: np.ndarray = final_embeddings.cpu().numpy()
 
         log.info(f"Embedding complete. Final shape: {result.shape}")
 
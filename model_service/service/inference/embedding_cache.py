@@ -0,0 +1,256 @@
+from typing import Dict, List, Optional
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import sqlite3
+import threading
+import numpy as np
+import logging
+
+log = logging.getLogger(__name__)
+
+
+def model_fingerprint(model_path: str, file_name: str, max_length: int) -> str:
+    """
+    Отпечаток модели для ключей кэша: файл модели (имя, размер, время изменения)
+        и параметры, влияющие на эмбеддинг
+    Args:
+        model_path (str): Путь до модели
+        file_name (str): Название модели
+        max_length (int): Максимальная длина входа модели в токенах
+    Returns:
+        str: Отпечаток модели
+    """
+    model_file = Path(model_path) / file_name
+    parts = [str(model_file), str(max_length)]
+    if model_file.exists():
+        stat = model_file.stat()
+        parts += [str(stat.st_size), str(stat.st_mtime_ns)]
+
+    return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Кэш эмбеддингов на диске с адресацией по содержимому.
+        Ключ - хэш отпечатка модели и текста, поэтому после смены модели
+        старые записи не используются и вытесняются как давно неиспользуемые (LRU).
+        Векторы float32 хранятся в файле, отображенном в память (numpy.memmap),
+        по слоту на запись, индекс ключ -> слот и порядок использования - в SQLite.
+        Порядок использования хранится в памяти, время использования при попадании
+        записывается на диск пакетами
+    """
+    VECTORS_FILE = "vectors.f32"
+    INDEX_FILE = "index.sqlite"
+    TOUCH_FLUSH_SIZE = 1024     # Количество попаданий, после которого время использования записывается на диск
+
+    def __init__(self,
+                 path: str,
+                 fingerprint: str,
+                 max_size_mb: float):
+        """
+        Args:
+            path (str): Директория кэша
+            fingerprint (str): Отпечаток модели (model_fingerprint)
+            max_size_mb (float): Максимальный размер файла векторов в МБ
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.fingerprint = fingerprint
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path / self.INDEX_FILE, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT)")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries (key BLOB PRIMARY KEY, slot INTEGER NOT NULL, used INTEGER NOT NULL)"
+        )
+        self._db.commit()
+
+        self._vectors: Optional[np.memmap] = None
+        self._index: "OrderedDict[bytes, int]" = OrderedDict()   # от давно использованных к недавним
+        self._free: List[int] = []
+        self._clock = 0
+        self._touched: Dict[bytes, int] = {}    # ключ -> время использования, не записанное на диск
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        meta = dict(self._db.execute("SELECT name, value FROM meta"))
+        if "dim" in meta:
+            self._open(int(meta["dim"]), int(meta["capacity"]))
+
+        log.info(f"EmbeddingCache opened: path={self.path}, entries={len(self._index)}, max_size_mb={max_size_mb}")
+
+    def _key(self, text: str) -> bytes:
+        """Ключ записи: хэш отпечатка модели и текста"""
+        return hashlib.sha256(f"{self.fingerprint}\0{text}".encode("utf-8")).digest()
+
+    def _open(self, dim: int, capacity: int):
+        """
+        Открытие файла векторов и загрузка индекса.
+            При увеличении размера кэша в конфигурации файл векторов расширяется,
+            при уменьшении - кэш очищается
+        """
+        expected = max(self.max_bytes // (dim * 4), 1)
+        vectors_file = self.path / self.VECTORS_FILE
+
+        if expected < capacity or not vectors_file.exists():
+            log.warning(f"EmbeddingCache reset: capacity {capacity} -> {expected}")
+            self._create(dim)
+            return
+
+        if expected > capacity:
+            log.info(f"EmbeddingCache resized: capacity {capacity} -> {expected}")
+            with open(vectors_file, "r+b") as f:
+                f.truncate(expected * dim * 4)
+            self._db.execute("UPDATE meta SET value = ? WHERE name = 'capacity'", (str(expected),))
+            self._db.commit()
+            capacity = expected
+
+        self._vectors = np.memmap(vectors_file, dtype=np.float32, mode="r+", shape=(capacity, dim))
+
+        rows = self._db.execute("SELECT key, slot, used FROM entries ORDER BY used").fetchall()
+        self._index = OrderedDict((key, slot) for key, slot, _ in rows)
+        used_slots = set(self._index.values())
+        self._free = [slot for slot in range(capacity - 1, -1, -1) if slot not in used_slots]
+        self._clock = rows[-1][2] if rows else 0
+
+    def _create(self, dim: int):
+        """Создание пустого кэша для эмбеддингов размерности dim"""
+        capacity = max(self.max_bytes // (dim * 4), 1)
+
+        self._db.execute("DELETE FROM entries")
+        self._db.executemany(
+            "INSERT OR REPLACE INTO meta (name, value) VALUES (?, ?)",
+            [("dim", str(dim)), ("capacity", str(capacity))],
+        )
+        self._db.commit()
+
+        self._vectors = np.memmap(
+            self.path / self.VECTORS_FILE, dtype=np.float32, mode="w+", shape=(capacity, dim)
+        )
+        self._index = OrderedDict()
+        self._free = list(range(capacity - 1, -1, -1))
+        self._clock = 0
+        self._touched = {}
+
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """
+        Получение эмбеддингов из кэша
+        Args:
+            texts (List[str]): Тексты
+        Returns:
+            List[Optional[np.ndarray]]: Эмбеддинги текстов, None для отсутствующих в кэше
+        """
+        result: List[Optional[np.ndarray]] = [None] * len(texts)
+
+        with self._lock:
+            if self._vectors is None:
+                self.misses += len(texts)
+                return result
+
+            for i, text in enumerate(texts):
+                key = self._key(text)
+                slot = self._index.get(key)
+                if slot is None:
+                    self.misses += 1
+                    continue
+
+                self._index.move_to_end(key)
+                self._clock += 1
+                self._touched[key] = self._clock
+                result[i] = np.array(self._vectors[slot])
+                self.hits += 1
+
+            if len(self._touched) >= self.TOUCH_FLUSH_SIZE:
+                self._flush_touched()
+                self._db.commit()
+
+        return result
+
+    def _flush_touched(self):
+        """Запись накопленного времени использования записей (вызывается под блокировкой, без commit)"""
+        if self._touched:
+            self._db.executemany(
+                "UPDATE entries SET used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def put_many(self, texts: List[str], embeddings: np.ndarray):
+        """
+        Сохранение эмбеддингов в кэш, при заполнении вытесняются давно неиспользуемые записи
+        Args:
+            texts (List[str]): Тексты
+            embeddings (np.ndarray): Эмбеддинги текстов, размер (N, dim)
+        """
+        with self._lock:
+            dim = embeddings.shape[1]
+            if self._vectors is None or self._vectors.shape[1] != dim:
+                self._create(dim)
+
+            rows = {}
+            evicted = []
+            for text, embedding in zip(texts, embeddings):
+                key = self._key(text)
+                slot = self._index.get(key)
+                if slot is None:
+                    if self._free:
+                        slot = self._free.pop()
+                    else:
+                        old_key, slot = self._index.popitem(last=False)
+                        rows.pop(old_key, None)
+                        self._touched.pop(old_key, None)
+                        evicted.append(old_key)
+                        self.evictions += 1
+                self._index[key] = slot
+                self._index.move_to_end(key)
+
+                self._clock += 1
+                rows[key] = (key, slot, self._clock, embedding)
+
+            # Порядок записи на диск: удаление вытесненных ключей, векторы, новые ключи.
+            # Так индекс не ссылается на перезаписанные или незаписанные слоты
+            if evicted:
+                self._db.executemany("DELETE FROM entries WHERE key = ?", [(key,) for key in evicted])
+            self._flush_touched()
+            self._db.commit()
+
+            for _, slot, _, embedding in rows.values():
+                self._vectors[slot] = embedding
+            self._vectors.flush()
+
+            self._db.executemany(
+                "INSERT OR REPLACE INTO entries (key, slot, used) VALUES (?, ?, ?)",
+                [(key, slot, used) for key, slot, used, _ in rows.values()],
+            )
+            self._db.commit()
+
+    def stats(self) -> dict:
+        """
+        Метрики кэша
+        Returns:
+            dict: Количество записей, попадания, промахи, вытеснения
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "entries": len(self._index),
+                "capacity": 0 if self._vectors is None else self._vectors.shape[0],
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
+
+    def close(self):
+        """Сброс векторов и времени использования на диск и закрытие индекса"""
+        with self._lock:
+            if self._vectors is not None:
+                self._vectors.flush()
+            self._flush_touched()
+            self._db.commit()
+            self._db.close()
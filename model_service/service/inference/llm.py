@@ -1,5 +1,13 @@
+from typing import Callable, Deque, List, Optional
+from collections import deque
+import codecs
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+import threading
 import torch
-from llama_cpp import Llama
+import llama_cpp
+from llama_cpp import Llama, LlamaState, StoppingCriteriaList
+from llama_cpp import _internals as llama_internals
 import logging
 
 log = logging.getLogger(__name__)
@@ -16,6 +24,7 @@ class LLMModel:
             n_ctx: int,
             threads: int,
             generate_params: dict,
+            prompt_prefix: Optional[str] = None,
     ):
         """
         Инициализация энкодера и токенайзера модели
@@ -24,6 +33,8 @@ class LLMModel:
             n_ctx (int): длина контекста
             threads (int): Количество потоков CPU
             generate_params (dict): Параметры для генерации
+            prompt_prefix (str, None): Общее начало промптов, состояние модели после
+                которого сохраняется и восстанавливается перед каждой генерацией
         """
 
         log.info(
@@ -46,14 +57,40 @@ class LLMModel:
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
         log.info(f"Using device: {self.device}")
 
+        self.prefix_state: Optional[LlamaState] = None
+        if prompt_prefix:
+            self._cache_prompt_prefix(prompt_prefix)
+
+    def _cache_prompt_prefix(self, prompt_prefix: str):
+        """
+        Вычисление общего начала промптов и сохранение состояния модели (KV-кэша).
+            После восстановления состояния llama.cpp находит совпадающие токены
+            в начале промпта и обрабатывает только оставшуюся часть
+        Args:
+            prompt_prefix (str): Общее начало промптов
+        """
+        tokens = self.model.tokenize(prompt_prefix.encode("utf-8"))
+
+        self.model.reset()
+        self.model.eval(tokens)
+        self.prefix_state = self.model.save_state()
+        self.model.reset()
+
+        log.info(f"Prompt prefix cached: {len(tokens)} tokens")
+
     def generate(
             self,
             prompt: str,
+            on_text: Optional[Callable[[str], None]] = None,
+            is_cancelled: Optional[Callable[[], bool]] = None,
     ):
         """
         Обращение к модели для генерации
         Args:
             prompt (str): Промпт для генерации
+            on_text (Callable, None): Вызывается с новой частью текста по мере генерации
+            is_cancelled (Callable, None): Проверка отмены, при отмене генерация
+                прекращается и возвращается полученная часть текста
         Returns:
             str: Результат генерации
         """
@@ -65,16 +102,17 @@ class LLMModel:
         log.debug(f"Prompt preview: {prompt[:200]}")
 
         try:
-            output = self.model(
-                prompt,
-                max_tokens=self.generate_params["max_tokens"],
-                temperature=self.generate_params["temperature"],
-                top_p=self.generate_params["top_p"],
-                top_k=self.generate_params["top_k"],
-                repeat_penalty=self.generate_params["repeat_penalty"],
-            )
+            if self.prefix_state is not None:
+                # Общее начало промпта не вычисляется заново
+                self.model.load_state(self.prefix_state)
 
-            text = output['choices'][0]['text']
+            if on_text is None:
+                text = self._complete(prompt, is_cancelled)
+            else:
+                text = self._stream(prompt, on_text, is_cancelled)
+
+            if is_cancelled is not None and is_cancelled():
+                log.info("Generation cancelled")
 
             log.debug(f"Raw model output: {text[:200]}")
             log.info(f"Generation complete (output length={len(text)})")
@@ -90,6 +128,400 @@ class LLMModel:
 
         return text
 
+    def _complete(self,
+                  prompt: str,
+                  is_cancelled: Optional[Callable[[], bool]] = None) -> str:
+        """Генерация целиком через create_completion, отмена проверяется после каждого токена"""
+        stopping_criteria = None
+        if is_cancelled is not None:
+            stopping_criteria = StoppingCriteriaList([lambda tokens, logits: is_cancelled()])
+
+        output = self.model(
+            prompt,
+            max_tokens=self.generate_params["max_tokens"],
+            temperature=self.generate_params["temperature"],
+            top_p=self.generate_params["top_p"],
+            top_k=self.generate_params["top_k"],
+            repeat_penalty=self.generate_params["repeat_penalty"],
+            stopping_criteria=stopping_criteria,
+        )
+        return output['choices'][0]['text']
+
+    def _stream(self,
+                prompt: str,
+                on_text: Callable[[str], None],
+                is_cancelled: Optional[Callable[[], bool]] = None) -> str:
+        """
+        Генерация по токенам с передачей текста по мере получения.
+            Используется генератор токенов Llama.generate, так как потоковый
+            режим create_completion заново детокенизирует весь ответ на каждом токене
+        """
+        tokens = self.model.tokenize(prompt.encode("utf-8"), special=True)
+        if len(tokens) >= self.model.n_ctx():
+            raise ValueError(
+                f"Requested tokens ({len(tokens)}) exceed context window of {self.model.n_ctx()}"
+            )
+        max_tokens = min(self.generate_params["max_tokens"], self.model.n_ctx() - len(tokens))
+
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        completion: List[int] = []
+
+        for token in self.model.generate(
+            tokens,
+            top_k=self.generate_params["top_k"],
+            top_p=self.generate_params["top_p"],
+            temp=self.generate_params["temperature"],
+            repeat_penalty=self.generate_params["repeat_penalty"],
+        ):
+            if llama_cpp.llama_token_is_eog(self.model._model.vocab, token):
+                break
+
+            completion.append(token)
+            piece = decoder.decode(self.model.detokenize([token]))
+            if piece:
+                on_text(piece)
+
+            if len(completion) >= max_tokens or (is_cancelled is not None and is_cancelled()):
+                break
+
+        return self.model.detokenize(completion, prev_tokens=tokens).decode("utf-8", errors="ignore")
+
+    def infer(self, prompt):
+        log.debug("Infer called")
+        return self.generate(prompt)
+
+
+@dataclass
+class _Sequence:
+    """Промпт, генерируемый в своей последовательности KV-кэша"""
+    prompt: str
+    future: Future
+    tokens: List[int] = field(default_factory=list)    # токены промпта, еще не переданные в модель
+    seq_id: int = -1
+    n_past: int = 0                                     # позиция следующего токена
+    n_cells: int = 0                                    # зарезервированные ячейки KV-кэша
+    sampler: Optional[llama_internals.LlamaSampler] = None
+    output: List[int] = field(default_factory=list)
+    next_token: Optional[int] = None
+    on_text: Optional[Callable[[str], None]] = None
+    is_cancelled: Optional[Callable[[], bool]] = None
+    decoder: codecs.IncrementalDecoder = field(
+        default_factory=lambda: codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    )
+
+
+class BatchedLLMModel:
+    """
+    LLM с непрерывным батчингом для одновременной генерации нескольких промптов.
+        Каждый промпт занимает свою последовательность общего KV-кэша,
+        на каждом шаге один вызов llama_decode обрабатывает очередной токен
+        всех генерируемых последовательностей и части промптов новых.
+        Новые промпты подключаются на любом шаге, завершенные освобождают место
+    """
+    # Количество последних токенов для штрафа за повторы (как в llama_cpp.Llama)
+    LAST_N_TOKENS = 64
+
+    def __init__(
+            self,
+            model_path: str,
+            n_ctx: int,
+            threads: int,
+            generate_params: dict,
+            max_sequences: int,
+            n_batch: int = 512,
+            prompt_prefix: Optional[str] = None,
+    ):
+        """
+        Args:
+            model_path (str): Путь до модели
+            n_ctx (int): длина контекста, общая для всех последовательностей
+            threads (int): Количество потоков CPU
+            generate_params (dict): Параметры для генерации
+            max_sequences (int): Максимальное количество одновременно генерируемых промптов
+            n_batch (int): Максимальное количество токенов в одном вызове llama_decode
+            prompt_prefix (str, None): Общее начало промптов, вычисляется один раз
+                и копируется в последовательность каждого промпта
+        """
+        log.info(
+            f"Initializing BatchedLLMModel: model_path={model_path}, "
+            f"n_ctx={n_ctx}, threads={threads}, max_sequences={max_sequences}"
+        )
+
+        self.generate_params = generate_params
+        self.max_sequences = max_sequences
+        self.n_ctx = n_ctx
+        self.n_batch = n_batch
+
+        model_params = llama_cpp.llama_model_default_params()
+        model_params.n_gpu_layers = 0
+
+        self.model = llama_internals.LlamaModel(
+            path_model=model_path,
+            params=model_params,
+            verbose=False,
+        )
+
+        # Последовательность 0 - общее начало промптов, 1..max_sequences - промпты
+        context_params = llama_cpp.llama_context_default_params()
+        context_params.n_ctx = n_ctx
+        context_params.n_batch = n_batch
+        context_params.n_ubatch = n_batch
+        context_params.n_threads = threads
+        context_params.n_threads_batch = threads
+        context_params.n_seq_max = max_sequences + 1
+        context_params.kv_unified = True   # ячейки общего начала не дублируются
+
+        self.ctx = llama_internals.LlamaContext(
+            model=self.model,
+            params=context_params,
+            verbose=False,
+        )
+        self.batch = llama_internals.LlamaBatch(
+            n_tokens=n_batch,
+            embd=0,
+            n_seq_max=1,
+            verbose=False,
+        )
+
+        self._condition = threading.Condition()
+        self._pending: Deque[_Sequence] = deque()
+        self._active: List[_Sequence] = []
+        self._free_seq_ids = list(range(max_sequences, 0, -1))
+        self._free_cells = n_ctx
+
+        self.prefix_tokens: List[int] = []
+        if prompt_prefix:
+            self._cache_prompt_prefix(prompt_prefix)
+
+        self._thread = threading.Thread(
+            target=self._loop,
+            name="llm-batched-decode",
+            daemon=True
+        )
+        self._thread.start()
+
+        log.debug("LLM model loaded successfully")
+
+    def _tokenize(self, text: str) -> List[int]:
+        return self.model.tokenize(text.encode("utf-8"), add_bos=True, special=True)
+
+    def _cache_prompt_prefix(self, prompt_prefix: str):
+        """
+        Вычисление общего начала промптов в последовательности 0
+        Args:
+            prompt_prefix (str): Общее начало промптов
+        """
+        tokens = self._tokenize(prompt_prefix)[:self.n_ctx // 2]
+
+        for start in range(0, len(tokens), self.n_batch):
+            self.batch.reset()
+            self._add_tokens(tokens[start:start + self.n_batch], 0, start, logits_last=False)
+            self.ctx.decode(self.batch)
+
+        self.prefix_tokens = tokens
+        self._free_cells -= len(tokens)
+        log.info(f"Prompt prefix cached: {len(tokens)} tokens")
+
+    def generate(
+            self,
+            prompt: str,
+            on_text: Optional[Callable[[str], None]] = None,
+            is_cancelled: Optional[Callable[[], bool]] = None,
+    ) -> str:
+        """
+        Генерация в общем батче (блокирует до получения результата)
+        Args:
+            prompt (str): Промпт для генерации
+            on_text (Callable, None): Вызывается с новой частью текста по мере генерации
+            is_cancelled (Callable, None): Проверка отмены, при отмене генерация
+                прекращается и возвращается полученная часть текста
+        Returns:
+            str: Результат генерации
+        """
+        return self.submit(prompt, on_text, is_cancelled).result()
+
     def infer(self, prompt):
         log.debug("Infer called")
         return self.generate(prompt)
+
+    def submit(
+            self,
+            prompt: str,
+            on_text: Optional[Callable[[str], None]] = None,
+            is_cancelled: Optional[Callable[[], bool]] = None,
+    ) -> Future:
+        """
+        Постановка промпта в очередь на генерацию
+        Args:
+            prompt (str): Промпт для генерации
+            on_text (Callable, None): Вызывается из потока генерации с новой частью текста
+            is_cancelled (Callable, None): Проверка отмены перед каждым шагом генерации
+        Returns:
+            Future: Future с результатом генерации
+        """
+        if not prompt:
+            log.warning("Empty prompt received")
+
+        sequence = _Sequence(prompt=prompt, future=Future(), on_text=on_text, is_cancelled=is_cancelled)
+        sequence.tokens = self._tokenize(prompt)
+
+        # Токены, совпадающие с общим началом, берутся из последовательности 0
+        n_shared = 0
+        for a, b in zip(self.prefix_tokens, sequence.tokens[:-1]):
+            if a != b:
+                break
+            n_shared += 1
+
+        sequence.n_past = n_shared
+        sequence.tokens = sequence.tokens[n_shared:]
+        sequence.n_cells = len(sequence.tokens) + self.generate_params["max_tokens"]
+
+        if sequence.n_cells > self.n_ctx - len(self.prefix_tokens):
+            raise ValueError(
+                f"Requested tokens ({n_shared + sequence.n_cells}) exceed context window of {self.n_ctx}"
+            )
+
+        log.info(f"Queued generation (prompt length={len(prompt)}, tokens={n_shared}+{len(sequence.tokens)})")
+
+        with self._condition:
+            self._pending.append(sequence)
+            self._condition.notify()
+
+        return sequence.future
+
+    def _init_sampler(self) -> llama_internals.LlamaSampler:
+        """Семплер последовательности (цепочка как в llama_cpp.Llama)"""
+        params = self.generate_params
+        sampler = llama_internals.LlamaSampler()
+        sampler.add_penalties(
+            penalty_last_n=self.LAST_N_TOKENS,
+            penalty_repeat=params["repeat_penalty"],
+            penalty_freq=0.0,
+            penalty_present=0.0,
+        )
+        if params["temperature"] == 0:
+            sampler.add_greedy()
+        else:
+            sampler.add_top_k(params["top_k"])
+            sampler.add_typical(1.0, 1)
+            sampler.add_top_p(params["top_p"], 1)
+            sampler.add_min_p(0.05, 1)
+            sampler.add_temp(params["temperature"])
+            sampler.add_dist(llama_cpp.LLAMA_DEFAULT_SEED)
+        return sampler
+
+    def _add_tokens(self, tokens: List[int], seq_id: int, start_pos: int, logits_last: bool):
+        """Добавление токенов последовательности в батч с позиции start_pos"""
+        batch = self.batch.batch
+        offset = batch.n_tokens
+        for i, token in enumerate(tokens):
+            batch.token[offset + i] = token
+            batch.pos[offset + i] = start_pos + i
+            batch.seq_id[offset + i][0] = seq_id
+            batch.n_seq_id[offset + i] = 1
+            batch.logits[offset + i] = False
+        batch.n_tokens = offset + len(tokens)
+        if logits_last and tokens:
+            batch.logits[batch.n_tokens - 1] = True
+
+    def _admit(self):
+        """Подключение ожидающих промптов при наличии свободных последовательностей и ячеек KV-кэша"""
+        with self._condition:
+            while not self._active and not self._pending:
+                self._condition.wait()
+
+            while (self._pending and self._free_seq_ids
+                   and self._pending[0].n_cells <= self._free_cells):
+                sequence = self._pending.popleft()
+                if not sequence.future.set_running_or_notify_cancel():
+                    continue
+                if sequence.is_cancelled is not None and sequence.is_cancelled():
+                    sequence.future.set_result("")
+                    continue
+
+                sequence.seq_id = self._free_seq_ids.pop()
+                sequence.sampler = self._init_sampler()
+                self._free_cells -= sequence.n_cells
+                if sequence.n_past:
+                    self.ctx.kv_cache_seq_cp(0, sequence.seq_id, 0, sequence.n_past)
+                self._active.append(sequence)
+
+    def _release(self, sequence: _Sequence):
+        """Освобождение последовательности и ее ячеек KV-кэша"""
+        self.ctx.kv_cache_seq_rm(sequence.seq_id, -1, -1)
+        sequence.sampler.close()
+        self._active.remove(sequence)
+        with self._condition:
+            self._free_seq_ids.append(sequence.seq_id)
+            self._free_cells += sequence.n_cells
+
+    def _step(self):
+        """Один вызов llama_decode для всех активных последовательностей"""
+        for sequence in list(self._active):
+            if sequence.is_cancelled is not None and sequence.is_cancelled():
+                log.info("Generation cancelled")
+                self._finish(sequence)
+        if not self._active:
+            return
+
+        self.batch.reset()
+        sampled = []    # (индекс логитов в батче, последовательность)
+
+        # Генерируемые последовательности - по одному токену
+        for sequence in self._active:
+            if sequence.next_token is not None:
+                self._add_tokens([sequence.next_token], sequence.seq_id, sequence.n_past, logits_last=True)
+                sequence.n_past += 1
+                sampled.append((self.batch.batch.n_tokens - 1, sequence))
+
+        # Оставшееся место - части промптов новых последовательностей
+        for sequence in self._active:
+            budget = self.n_batch - self.batch.batch.n_tokens
+            if budget <= 0:
+                break
+            if not sequence.tokens:
+                continue
+
+            chunk, sequence.tokens = sequence.tokens[:budget], sequence.tokens[budget:]
+            self._add_tokens(chunk, sequence.seq_id, sequence.n_past, logits_last=not sequence.tokens)
+            sequence.n_past += len(chunk)
+            if not sequence.tokens:
+                sampled.append((self.batch.batch.n_tokens - 1, sequence))
+
+        self.ctx.decode(self.batch)
+
+        for index, sequence in sampled:
+            token = sequence.sampler.sample(self.ctx, index)
+            if (llama_cpp.llama_token_is_eog(self.model.vocab, token)
+                    or len(sequence.output) >= self.generate_params["max_tokens"]):
+                self._finish(sequence)
+                continue
+            sequence.output.append(token)
+            sequence.next_token = token
+
+            if sequence.on_text is not None:
+                piece = sequence.decoder.decode(self.model.detokenize([token]))
+                if piece:
+                    sequence.on_text(piece)
+
+    def _finish(self, sequence: _Sequence, error: Optional[Exception] = None):
+        """Завершение генерации последовательности"""
+        self._release(sequence)
+
+        if error is not None:
+            sequence.future.set_exception(error)
+            return
+
+        text = self.model.detokenize(sequence.output).decode("utf-8", errors="ignore")
+        log.info(f"Generation complete (output length={len(text)})")
+        sequence.future.set_result(text)
+
+    def _loop(self):
+        while True:
+            self._admit()
+            try:
+                self._step()
+            except Exception as e:
+                log.exception("Error during batched generation")
+                for sequence in list(self._active):
+                    self._finish(sequence, e)
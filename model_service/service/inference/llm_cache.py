@@ -0,0 +1,188 @@
+from typing import Dict, Optional
+from importlib import metadata
+from pathlib import Path
+import hashlib
+import json
+import sqlite3
+import threading
+import logging
+
+log = logging.getLogger(__name__)
+
+
+def is_deterministic(generate_params: dict) -> bool:
+    """
+    Детерминирована ли генерация с параметрами (жадный выбор токена)
+    Args:
+        generate_params (dict): Параметры генерации
+    Returns:
+        bool: True, если результат зависит только от промпта и модели
+    """
+    return generate_params.get("temperature") == 0 or generate_params.get("top_k") == 1
+
+
+def generation_fingerprint(model_params: dict) -> str:
+    """
+    Отпечаток модели и параметров для ключей кэша: файл модели (путь, размер, время изменения),
+        параметры генерации, длина контекста, количество потоков и версия llama-cpp-python
+    Args:
+        model_params (dict): Параметры LLMModel
+    Returns:
+        str: Отпечаток модели и параметров
+    """
+    model_file = Path(model_params["model_path"])
+    parts = {
+        "model": str(model_file),
+        "generate": model_params["generate_params"],
+        "n_ctx": model_params["n_ctx"],
+        "threads": model_params["threads"],
+    }
+    if model_file.exists():
+        stat = model_file.stat()
+        parts["size"], parts["mtime"] = stat.st_size, stat.st_mtime_ns
+    try:
+        parts["llama_cpp"] = metadata.version("llama-cpp-python")
+    except metadata.PackageNotFoundError:
+        pass
+
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class GenerationCache:
+    """
+    Кэш результатов детерминированной генерации на диске (SQLite).
+        Ключ - хэш отпечатка модели и параметров и промпта, поэтому после смены
+        модели или параметров старые записи не используются и вытесняются
+        как давно неиспользуемые (LRU) при превышении размера.
+        Время использования при попадании записывается на диск пакетами
+    """
+    TOUCH_FLUSH_SIZE = 64   # Количество попаданий, после которого время использования записывается на диск
+
+    def __init__(self,
+                 path: str,
+                 fingerprint: str,
+                 max_size_mb: float):
+        """
+        Args:
+            path (str): Директория кэша
+            fingerprint (str): Отпечаток модели и параметров (generation_fingerprint)
+            max_size_mb (float): Максимальный суммарный размер результатов в МБ
+        """
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.fingerprint = fingerprint
+        self.max_bytes = int(max_size_mb * 1024 * 1024)
+
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path / "generations.sqlite", check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS entries "
+            "(key BLOB PRIMARY KEY, text TEXT NOT NULL, size INTEGER NOT NULL, used INTEGER NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries (used)")
+        self._db.commit()
+
+        self._bytes, self._clock, count = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0), COALESCE(MAX(used), 0), COUNT(*) FROM entries"
+        ).fetchone()
+
+        self._touched: Dict[bytes, int] = {}    # ключ -> время использования, не записанное на диск
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        log.info(f"GenerationCache opened: path={self.path}, entries={count}, max_size_mb={max_size_mb}")
+
+    def _key(self, prompt: str) -> bytes:
+        """Ключ записи: хэш отпечатка модели и параметров и промпта"""
+        return hashlib.sha256(f"{self.fingerprint}\0{prompt}".encode("utf-8")).digest()
+
+    def get(self, prompt: str) -> Optional[str]:
+        """
+        Получение результата генерации из кэша
+        Args:
+            prompt (str): Промпт
+        Returns:
+            Optional[str]: Результат генерации, None - нет в кэше
+        """
+        key = self._key(prompt)
+        with self._lock:
+            row = self._db.execute("SELECT text FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            self._clock += 1
+            self._touched[key] = self._clock
+            if len(self._touched) >= self.TOUCH_FLUSH_SIZE:
+                self._flush_touched()
+                self._db.commit()
+            self.hits += 1
+            return row[0]
+
+    def _flush_touched(self):
+        """Запись накопленного времени использования записей (вызывается под блокировкой, без commit)"""
+        if self._touched:
+            self._db.executemany(
+                "UPDATE entries SET used = ? WHERE key = ?",
+                [(used, key) for key, used in self._touched.items()],
+            )
+            self._touched.clear()
+
+    def put(self, prompt: str, text: str):
+        """
+        Сохранение результата генерации, при превышении размера вытесняются давно неиспользуемые записи
+        Args:
+            prompt (str): Промпт
+            text (str): Результат генерации
+        """
+        key = self._key(prompt)
+        size = len(text.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            # Порядок вытеснения учитывает попадания, еще не записанные на диск
+            self._flush_touched()
+            old = self._db.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self._clock += 1
+            self._db.execute(
+                "INSERT OR REPLACE INTO entries (key, text, size, used) VALUES (?, ?, ?, ?)",
+                (key, text, size, self._clock),
+            )
+            self._bytes += size - (old[0] if old else 0)
+
+            while self._bytes > self.max_bytes:
+                old_key, old_size = self._db.execute(
+                    "SELECT key, size FROM entries ORDER BY used LIMIT 1"
+                ).fetchone()
+                self._db.execute("DELETE FROM entries WHERE key = ?", (old_key,))
+                self._bytes -= old_size
+                self.evictions += 1
+
+            self._db.commit()
+
+    def stats(self) -> dict:
+        """
+        Метрики кэша
+        Returns:
+            dict: Размер, попадания, промахи, вытеснения
+        """
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            }
+
+    def close(self):
+        """Запись времени использования и закрытие кэша"""
+        with self._lock:
+            self._flush_touched()
+            self._db.commit()
+            self._db.close()
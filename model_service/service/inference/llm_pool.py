@@ -0,0 +1,696 @@
+from typing import AsyncIterator, Callable, Deque, Dict, Optional, Set, Tuple
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from multiprocessing.connection import Connection, wait
+from multiprocessing.process import BaseProcess
+import multiprocessing as mp
+import asyncio
+import atexit
+import functools
+import itertools
+import threading
+import time
+import logging
+
+from model_service.service.inference.priority import Priority
+from model_service.service.inference.llm_cache import GenerationCache
+
+log = logging.getLogger(__name__)
+
+
+class LLMQueueFullError(RuntimeError):
+    """Очередь запросов к LLM заполнена, запрос отклонен"""
+
+
+class LLMDeadlineError(RuntimeError):
+    """Запрос к LLM не может быть выполнен до дедлайна клиента"""
+
+
+class LLMUnavailableError(RuntimeError):
+    """Ни один воркер LLM не запускается, запрос не может быть выполнен"""
+
+
+@dataclass
+class _Request:
+    """Запрос к LLM, ожидающий результата"""
+    future: Future
+    submitted_at: float
+    prompt: str = ""
+    priority: Priority = Priority.INTERACTIVE
+    deadline: Optional[float] = None
+    on_text: Optional[Callable[[str], None]] = None
+    worker_id: Optional[int] = None
+    started_at: Optional[float] = None
+    cancelled: bool = False
+
+
+def _worker_main(worker_id: int,
+                 model_params: dict,
+                 slots: int,
+                 tasks: Connection,
+                 results: Connection):
+    """
+    Процесс-воркер: загружает свой экземпляр LLM и выполняет назначенные ему запросы.
+        При slots > 1 запросы генерируются одновременно в общем батче (BatchedLLMModel)
+    Args:
+        worker_id (int): Номер воркера
+        model_params (dict): Параметры LLMModel
+        slots (int): Количество одновременно выполняемых запросов
+        tasks (Connection): Команды (generate/cancel, id запроса, промпт, передавать ли текст
+            по мере генерации), None - завершение
+        results (Connection): События (тип, id запроса, время начала, значение)
+    """
+    from model_service.service.logging_config import setup_logging
+    from model_service.service.inference.llm import LLMModel, BatchedLLMModel
+
+    setup_logging()
+    if slots > 1:
+        model = BatchedLLMModel(max_sequences=slots, **model_params)
+    else:
+        model = LLMModel(**model_params)
+
+    # Результаты батча отправляются из потока генерации
+    send_lock = threading.Lock()
+
+    def send(event, request_id, started_at, value):
+        with send_lock:
+            results.send((event, request_id, started_at, value))
+
+    # Генерация одиночной моделью в отдельном потоке, чтобы принимать команды отмены
+    executor = ThreadPoolExecutor(max_workers=1) if slots == 1 else None
+    cancels: Dict[int, threading.Event] = {}
+
+    def reply(request_id, started_at, future: Future):
+        cancels.pop(request_id, None)
+        error = future.exception()
+        if error is None:
+            send("done", request_id, started_at, future.result())
+        else:
+            send("error", request_id, started_at, repr(error))
+
+    send("ready", None, None, None)
+    log.info(f"LLM worker {worker_id} ready")
+
+    while True:
+        task = tasks.recv()
+        if task is None:
+            break
+
+        command, request_id, prompt, stream = task
+        if command == "cancel":
+            cancel = cancels.get(request_id)
+            if cancel is not None:
+                cancel.set()
+            continue
+
+        started_at = time.time()
+        cancel = cancels[request_id] = threading.Event()
+        on_text = functools.partial(send, "text", request_id, None) if stream else None
+        try:
+            if slots > 1:
+                future = model.submit(prompt, on_text, cancel.is_set)
+            else:
+                future = executor.submit(model.generate, prompt, on_text, cancel.is_set)
+        except Exception as e:
+            cancels.pop(request_id, None)
+            send("error", request_id, started_at, repr(e))
+            continue
+        future.add_done_callback(functools.partial(reply, request_id, started_at))
+
+
+@dataclass
+class _Worker:
+    """Процесс-воркер и каналы связи с ним"""
+    process: BaseProcess
+    tasks: Connection
+    results: Connection
+    request_ids: Set[int] = field(default_factory=set)
+    ready: bool = False
+
+
+class LLMWorkerPool:
+    """
+    Пул процессов с отдельными экземплярами llama.cpp.
+        Запросы назначаются воркерам со свободными слотами, остальные ждут в очереди
+        своего класса приоритета ограниченного размера, при заполненной очереди
+        запрос отклоняется (LLMQueueFullError). Свободный слот получает первый запрос
+        из очереди более приоритетного класса, число одновременно выполняемых запросов
+        класса ограничивается max_running. Для каждого запроса учитывается время ожидания
+        в очереди и время генерации. Запросы, клиент которых отменил вызов,
+        удаляются из очереди или прекращают генерацию. Запросы с дедлайном, которым
+        не достается свободный слот сразу, отклоняются (LLMDeadlineError), если по
+        оставшемуся времени выполняющихся запросов и скользящей средней длительности
+        генерации не успеют выполниться, и снимаются с очереди при истечении дедлайна.
+        При заданном кэше повторный промпт возвращается из кэша без генерации.
+        Упавший воркер перезапускается, при неудачном запуске (падение до загрузки модели) -
+        с нарастающей задержкой. После MAX_STARTUP_FAILURES неудачных запусков подряд воркер
+        больше не запускается, если так остановлены все воркеры, запросы завершаются
+        ошибкой LLMUnavailableError
+    """
+    RUN_EWMA_ALPHA = 0.2            # Вес последней генерации в скользящей средней длительности
+    RESTART_BACKOFF = 1.0           # Задержка перезапуска после первого неудачного запуска в секундах
+    RESTART_BACKOFF_MAX = 60.0      # Максимальная задержка перезапуска в секундах
+    MAX_STARTUP_FAILURES = 5        # Количество неудачных запусков подряд, после которого воркер не запускается
+
+    def __init__(self,
+                 model_params: dict,
+                 n_workers: int,
+                 priorities: Dict[str, dict],
+                 slots_per_worker: int = 1,
+                 cache: Optional[GenerationCache] = None):
+        """
+        Args:
+            model_params (dict): Параметры LLMModel для каждого воркера
+            n_workers (int): Количество процессов (каждый загружает модель в ОЗУ
+                и использует model_params["threads"] потоков CPU)
+            priorities (Dict[str, dict]): Ограничения классов приоритета (interactive, bulk):
+                max_running - максимум одновременно выполняемых запросов класса (None - без ограничения),
+                max_queue_size - максимум запросов класса, ожидающих свободного слота
+            slots_per_worker (int): Количество запросов, одновременно генерируемых
+                одним воркером (непрерывный батчинг)
+            cache (GenerationCache, None): Кэш результатов детерминированной генерации,
+                None - без кэша
+        """
+        self.model_params = model_params
+        self.n_workers = n_workers
+        self.slots_per_worker = slots_per_worker
+        self.cache = cache
+        self.max_running = {p: priorities[p.value]["max_running"] for p in Priority}
+        self.max_queue_size = {p: priorities[p.value]["max_queue_size"] for p in Priority}
+
+        self._ctx = mp.get_context("spawn")
+
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._pending: Dict[int, _Request] = {}
+        self._queues: Dict[Priority, Deque[Tuple[int, str]]] = {p: deque() for p in Priority}
+        self._running: Dict[Priority, int] = dict.fromkeys(Priority, 0)
+        self._idle: Deque[int] = deque()                # по элементу на свободный слот воркера
+        self._startup_failures: Dict[int, int] = dict.fromkeys(range(n_workers), 0)
+        self._restart_at: Dict[int, float] = {}         # воркер -> время отложенного перезапуска
+        self._broken: Set[int] = set()                  # воркеры, которые больше не запускаются
+
+        self._completed = 0
+        self._failed = 0
+        self._rejected: Dict[Priority, int] = dict.fromkeys(Priority, 0)
+        self._shed: Dict[Priority, int] = dict.fromkeys(Priority, 0)
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+        self._run_ewma: Optional[float] = None
+        self._closed = False
+
+        self._workers: Dict[int, _Worker] = {i: self._start_worker(i) for i in range(n_workers)}
+
+        self._thread = threading.Thread(
+            target=self._loop,
+            name="llm-pool-dispatcher",
+            daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+        log.info(f"LLMWorkerPool started: n_workers={n_workers}, priorities={priorities}")
+
+    def _start_worker(self, worker_id: int) -> _Worker:
+        """Запуск процесса-воркера, свободным он становится после загрузки модели"""
+        tasks_recv, tasks_send = self._ctx.Pipe(duplex=False)
+        results_recv, results_send = self._ctx.Pipe(duplex=False)
+
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.model_params, self.slots_per_worker, tasks_recv, results_send),
+            name=f"llm-worker-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+
+        # Концы каналов воркера в основном процессе не нужны
+        tasks_recv.close()
+        results_send.close()
+
+        return _Worker(process=process, tasks=tasks_send, results=results_recv)
+
+    def close(self, timeout: float = 5):
+        """
+        Остановка воркеров
+        Args:
+            timeout (float): Время ожидания завершения каждого процесса в секундах
+        """
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+
+        # Отложенные перезапуски после закрытия не выполняются (цикл диспетчера завершается)
+        workers = list(self._workers.values())
+        for worker in workers:
+            try:
+                worker.tasks.send(None)
+            except OSError:
+                pass
+        for worker in workers:
+            worker.process.join(timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+    async def generate(self,
+                       prompt: str,
+                       priority: Priority = Priority.INTERACTIVE,
+                       deadline: Optional[float] = None) -> str:
+        """
+        Генерация через пул без блокировки event loop
+        Args:
+            prompt (str): Промпт для генерации
+            priority (Priority): Класс приоритета запроса
+            deadline (float, None): Дедлайн клиента (time.time()), None - без дедлайна
+        Returns:
+            str: Результат генерации. При отмене ожидающей корутины
+                (клиент отменил вызов, истек дедлайн) запрос отменяется в пуле
+        """
+        cached = await self._from_cache_async(prompt, priority)
+        if cached is not None:
+            return cached
+
+        request_id, future = self._submit(prompt, priority, deadline)
+        try:
+            # shield: Future пула завершает только пул, отмена передается через cancel
+            return await asyncio.shield(asyncio.wrap_future(future))
+        except asyncio.CancelledError:
+            self.cancel(request_id)
+            raise
+
+    async def stream(self,
+                     prompt: str,
+                     priority: Priority = Priority.INTERACTIVE,
+                     deadline: Optional[float] = None) -> AsyncIterator[str]:
+        """
+        Генерация с получением текста по мере генерации
+        Args:
+            prompt (str): Промпт для генерации
+            priority (Priority): Класс приоритета запроса
+            deadline (float, None): Дедлайн клиента (time.time()), None - без дедлайна
+        Returns:
+            AsyncIterator[str]: Новые части сгенерированного текста.
+                При прекращении итерации или отмене генерация отменяется
+        """
+        cached = await self._from_cache_async(prompt, priority)
+        if cached is not None:
+            yield cached
+            return
+
+        loop = asyncio.get_running_loop()
+        chunks: "asyncio.Queue[Optional[str]]" = asyncio.Queue()
+
+        def put(chunk: Optional[str]):
+            loop.call_soon_threadsafe(chunks.put_nowait, chunk)
+
+        request_id, future = self._submit(prompt, priority, deadline, on_text=put)
+        future.add_done_callback(lambda _: put(None))
+
+        try:
+            while True:
+                chunk = await chunks.get()
+                if chunk is None:
+                    break
+                yield chunk
+            # Ошибка генерации передается вызывающему
+            if not future.cancelled():
+                future.result()
+        finally:
+            if not future.done():
+                self.cancel(request_id)
+
+    def submit(self,
+               prompt: str,
+               priority: Priority = Priority.INTERACTIVE,
+               deadline: Optional[float] = None) -> Future:
+        """
+        Назначение промпта свободному воркеру или постановка в очередь
+        Args:
+            prompt (str): Промпт для генерации
+            priority (Priority): Класс приоритета запроса
+            deadline (float, None): Дедлайн клиента (time.time()), None - без дедлайна
+        Returns:
+            Future: Future с результатом генерации
+        """
+        cached = self._from_cache(prompt, priority)
+        if cached is not None:
+            future = Future()
+            future.set_result(cached)
+            return future
+        return self._submit(prompt, priority, deadline)[1]
+
+    def _from_cache(self, prompt: str, priority: Priority) -> Optional[str]:
+        """Результат генерации из кэша, None - кэша нет или промпта нет в кэше"""
+        if self.cache is None:
+            return None
+        cached = self.cache.get(prompt)
+        if cached is not None:
+            log.info(f"LLM {priority.value} request served from cache")
+        return cached
+
+    async def _from_cache_async(self, prompt: str, priority: Priority) -> Optional[str]:
+        """Поиск в кэше (запрос к SQLite) в пуле потоков, без блокировки event loop"""
+        if self.cache is None:
+            return None
+        return await asyncio.get_running_loop().run_in_executor(None, self._from_cache, prompt, priority)
+
+    def _submit(self,
+                prompt: str,
+                priority: Priority,
+                deadline: Optional[float] = None,
+                on_text: Optional[Callable[[str], None]] = None) -> Tuple[int, Future]:
+        """Постановка запроса в очередь класса, возвращает id запроса и Future с результатом"""
+        with self._lock:
+            if len(self._broken) == self.n_workers:
+                raise LLMUnavailableError("All LLM workers failed to start")
+
+            if deadline is not None:
+                expected = self._expected_finish(priority)
+                if expected is not None and expected > deadline:
+                    self._shed[priority] += 1
+                    raise LLMDeadlineError(
+                        f"LLM {priority.value} request cannot finish before deadline: "
+                        f"expected in {expected - time.time():.1f} s, deadline in {deadline - time.time():.1f} s"
+                    )
+
+            queue = self._queues[priority]
+            if not self._can_start(priority) and len(queue) >= self.max_queue_size[priority]:
+                self._rejected[priority] += 1
+                raise LLMQueueFullError(
+                    f"LLM {priority.value} queue is full: {len(queue)} queued, "
+                    f"{self._running[priority]} {priority.value} requests running"
+                )
+
+            request_id = next(self._ids)
+            future = Future()
+            self._pending[request_id] = _Request(
+                future=future,
+                submitted_at=time.time(),
+                prompt=prompt,
+                priority=priority,
+                deadline=deadline,
+                on_text=on_text,
+            )
+            queue.append((request_id, prompt))
+            self._dispatch()
+
+        return request_id, future
+
+    def cancel(self, request_id: int):
+        """
+        Отмена запроса: ожидающий удаляется из очереди,
+            выполняющийся прекращает генерацию с полученной частью текста
+        Args:
+            request_id (int): id запроса
+        """
+        with self._lock:
+            request = self._pending.get(request_id)
+            if request is None:
+                return
+
+            if request.worker_id is not None:
+                # Часть текста отмененного запроса не сохраняется в кэш
+                request.cancelled = True
+                try:
+                    self._workers[request.worker_id].tasks.send(("cancel", request_id, None, None))
+                except OSError:
+                    pass
+                return
+
+            self._pending.pop(request_id)
+            self._queues[request.priority] = deque(
+                task for task in self._queues[request.priority] if task[0] != request_id
+            )
+
+        log.info(f"LLM request {request_id} cancelled in queue")
+        request.future.cancel()
+
+    def _can_start(self, priority: Priority) -> bool:
+        """Есть ли свободный слот для запроса класса с учетом max_running (вызывается под блокировкой)"""
+        max_running = self.max_running[priority]
+        return bool(self._idle) and (max_running is None or self._running[priority] < max_running)
+
+    def _expected_finish(self, priority: Priority) -> Optional[float]:
+        """
+        Оценка времени завершения нового запроса класса (вызывается под блокировкой):
+            слоты освобождаются по мере завершения выполняющихся запросов (скользящая средняя
+            длительности генерации за вычетом прошедшего времени), запросы в очереди
+            впереди занимают их по очереди
+        Returns:
+            Optional[float]: Ожидаемое время завершения (time.time()), None - запрос принимается
+                без оценки (есть свободный слот и нет очереди впереди, нет завершенных генераций)
+        """
+        # Запросы этого и более приоритетных классов будут назначены раньше
+        classes = list(Priority)
+        ahead = sum(len(self._queues[p]) for p in classes[:classes.index(priority) + 1])
+        run = self._run_ewma
+        if (not ahead and self._can_start(priority)) or run is None:
+            return None
+
+        now = time.time()
+        remaining = [
+            (request.priority, max(run - (now - request.started_at), 0.0))
+            for request in self._pending.values()
+            if request.started_at is not None
+        ]
+        free = sorted([0.0] * len(self._idle) + [left for _, left in remaining])
+
+        max_running = self.max_running[priority]
+        if max_running is not None:
+            own = sorted(left for p, left in remaining if p == priority)
+            if len(own) >= max_running:
+                # Класс достиг max_running: слот для него освободится с завершением его запроса
+                free = own
+            free = free[:max_running]
+        if not free:
+            return None
+
+        return now + free[ahead % len(free)] + (ahead // len(free) + 1) * run
+
+    def _dispatch(self):
+        """
+        Назначение запросов из очередей свободным воркерам (вызывается под блокировкой).
+            Очереди просматриваются в порядке приоритета, запросы класса, достигшего
+            max_running, ждут завершения своих выполняющихся запросов.
+            Запросы с истекшим дедлайном снимаются с очереди без генерации
+        """
+        while True:
+            priority = next(
+                (p for p in Priority if self._queues[p] and self._can_start(p)),
+                None
+            )
+            if priority is None:
+                return
+
+            request_id, prompt = self._queues[priority].popleft()
+            request = self._pending[request_id]
+
+            if request.deadline is not None and request.deadline <= time.time():
+                self._pending.pop(request_id)
+                self._shed[priority] += 1
+                log.info(f"LLM {priority.value} request {request_id} dropped from queue: deadline expired")
+                request.future.set_exception(LLMDeadlineError("Deadline expired in LLM queue"))
+                continue
+
+            worker_id = self._idle.popleft()
+            request.worker_id = worker_id
+            request.started_at = time.time()
+            self._running[priority] += 1
+
+            worker = self._workers[worker_id]
+            worker.request_ids.add(request_id)
+            worker.tasks.send(("generate", request_id, prompt, request.on_text is not None))
+
+    def stats(self) -> dict:
+        """
+        Состояние пула
+        Returns:
+            dict: Глубина очереди, занятость воркеров и время ожидания/генерации
+        """
+        with self._lock:
+            finished = self._completed + self._failed
+            return {
+                "workers": self.n_workers,
+                "restarting": len(self._restart_at),
+                "broken": len(self._broken),
+                "running": sum(len(w.request_ids) for w in self._workers.values()),
+                "queued": sum(len(q) for q in self._queues.values()),
+                "priorities": {
+                    p.value: {
+                        "running": self._running[p],
+                        "queued": len(self._queues[p]),
+                        "rejected": self._rejected[p],
+                        "shed": self._shed[p],
+                    }
+                    for p in Priority
+                },
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": sum(self._rejected.values()),
+                "shed": sum(self._shed.values()),
+                "avg_wait_ms": round(self._wait_total / finished * 1000, 1) if finished else 0.0,
+                "max_wait_ms": round(self._wait_max * 1000, 1),
+                "avg_run_ms": round(self._run_total / finished * 1000, 1) if finished else 0.0,
+                "ewma_run_ms": round(self._run_ewma * 1000, 1) if self._run_ewma is not None else 0.0,
+                "cache": self.cache.stats() if self.cache is not None else None,
+            }
+
+    def _finish(self,
+                worker_id: int,
+                request_id: int,
+                started_at: Optional[float],
+                result: Optional[str],
+                error: Optional[str]):
+        """Завершение запроса воркера и учет времени ожидания и генерации"""
+        finished_at = time.time()
+        with self._lock:
+            self._workers[worker_id].request_ids.discard(request_id)
+            request = self._pending.pop(request_id, None)
+            if request is None:
+                return
+            self._running[request.priority] -= 1
+
+            started_at = started_at or finished_at
+            wait = started_at - request.submitted_at
+            run = finished_at - started_at
+
+            self._wait_total += wait
+            self._wait_max = max(self._wait_max, wait)
+            self._run_total += run
+            if error is None:
+                self._completed += 1
+            else:
+                self._failed += 1
+
+            # Прерванные и неудачные генерации не отражают длительность полной генерации
+            if error is None and not request.cancelled:
+                alpha = self.RUN_EWMA_ALPHA
+                self._run_ewma = run if self._run_ewma is None else alpha * run + (1 - alpha) * self._run_ewma
+
+            queued = sum(len(q) for q in self._queues.values())
+
+        log.info(
+            f"LLM {request.priority.value} request {request_id} finished on worker {worker_id}: "
+            f"wait={wait * 1000:.0f} ms, run={run * 1000:.0f} ms, queued={queued}"
+        )
+
+        if error is None:
+            request.future.set_result(result)
+            if self.cache is not None and not request.cancelled:
+                self.cache.put(request.prompt, result)
+        else:
+            request.future.set_exception(RuntimeError(error))
+
+    def _on_message(self, worker_id: int):
+        """Обработка сообщения воркера"""
+        event, request_id, started_at, value = self._workers[worker_id].results.recv()
+
+        if event == "text":
+            with self._lock:
+                request = self._pending.get(request_id)
+            if request is not None and request.on_text is not None:
+                request.on_text(value)
+            return
+
+        if event == "done":
+            self._finish(worker_id, request_id, started_at, value, None)
+        elif event == "error":
+            self._finish(worker_id, request_id, started_at, None, value)
+
+        # Освободились слоты воркера (все после загрузки модели или один после выполнения запроса)
+        with self._lock:
+            if event == "ready":
+                self._workers[worker_id].ready = True
+                self._startup_failures[worker_id] = 0
+            self._idle.extend([worker_id] * (self.slots_per_worker if event == "ready" else 1))
+            self._dispatch()
+
+    def _restart(self, worker_id: int):
+        """
+        Перезапуск упавшего воркера, выполнявшиеся им запросы завершаются ошибкой.
+            Воркер, упавший до загрузки модели, перезапускается с задержкой,
+            после MAX_STARTUP_FAILURES таких падений подряд - не перезапускается
+        """
+        worker = self._workers[worker_id]
+
+        for request_id in list(worker.request_ids):
+            self._finish(worker_id, request_id, None, None, "LLM worker died during generation")
+
+        worker.tasks.close()
+        worker.results.close()
+
+        with self._lock:
+            self._idle = deque(i for i in self._idle if i != worker_id)
+            del self._workers[worker_id]
+
+            if worker.ready:
+                log.error(f"LLM worker {worker_id} died (exitcode={worker.process.exitcode}), restarting")
+                self._restart_at[worker_id] = time.time()
+                return
+
+            failures = self._startup_failures[worker_id] = self._startup_failures[worker_id] + 1
+            if failures < self.MAX_STARTUP_FAILURES:
+                delay = min(self.RESTART_BACKOFF * 2 ** (failures - 1), self.RESTART_BACKOFF_MAX)
+                log.error(
+                    f"LLM worker {worker_id} failed to start (exitcode={worker.process.exitcode}), "
+                    f"restarting in {delay:.1f} s, attempt {failures}/{self.MAX_STARTUP_FAILURES}"
+                )
+                self._restart_at[worker_id] = time.time() + delay
+                return
+
+            log.error(f"LLM worker {worker_id} failed to start {failures} times in a row, giving up")
+            self._broken.add(worker_id)
+            if len(self._broken) < self.n_workers:
+                return
+
+            # Запросы в очереди не дождутся свободного слота
+            failed = [self._pending.pop(request_id) for queue in self._queues.values() for request_id, _ in queue]
+            for queue in self._queues.values():
+                queue.clear()
+
+        for request in failed:
+            request.future.set_exception(LLMUnavailableError("All LLM workers failed to start"))
+
+    def _start_due_workers(self) -> float:
+        """
+        Запуск воркеров, время отложенного перезапуска которых наступило
+        Returns:
+            float: Время до следующего отложенного перезапуска в секундах (не больше 1)
+        """
+        now = time.time()
+        for worker_id, restart_at in list(self._restart_at.items()):
+            if restart_at <= now:
+                del self._restart_at[worker_id]
+                worker = self._start_worker(worker_id)
+                with self._lock:
+                    self._workers[worker_id] = worker
+
+        return min([1.0] + [max(t - now, 0.0) for t in self._restart_at.values()])
+
+    def _loop(self):
+        while not self._closed:
+            timeout = self._start_due_workers()
+
+            objects = {}
+            for worker_id, worker in self._workers.items():
+                objects[worker.results] = (worker_id, False)
+                objects[worker.process.sentinel] = (worker_id, True)
+            if not objects:
+                time.sleep(timeout)
+                continue
+
+            for ready in wait(list(objects), timeout=timeout):
+                worker_id, died = objects[ready]
+                if not died:
+                    try:
+                        self._on_message(worker_id)
+                        continue
+                    except EOFError:
+                        # Процесс завершился, канал закрыт
+                        self._workers[worker_id].process.join()
+                if not self._closed and not self._workers[worker_id].process.is_alive():
+                    self._restart(worker_id)
+                    break
@@ -0,0 +1,7 @@
+from enum import Enum
+
+
+class Priority(Enum):
+    """Класс приоритета запроса, порядок объявления - порядок обслуживания очередей"""
+    INTERACTIVE = "interactive"     # Поиск и суммаризация по запросу пользователя
+    BULK = "bulk"                   # Фоновое обновление данных
@@ -0,0 +1,75 @@
+# Сравнение форматов передачи эмбеддингов в EmbeddingResponse
+# Запуск из корня репозитория: python -m model_service.utils.comparison_encodings
+import time
+import numpy as np
+
+from contracts.generated import model_pb2
+
+
+DTYPES = {
+    model_pb2.FLOAT32: np.dtype("<f4"),
+    model_pb2.FLOAT16: np.dtype("<f2"),
+}
+
+
+def encode_list(embeddings):
+    return model_pb2.EmbeddingResponse(
+        embeddings=[model_pb2.Embedding(vector=emb.tolist()) for emb in embeddings]
+    ).SerializeToString()
+
+
+def decode_list(data):
+    response = model_pb2.EmbeddingResponse.FromString(data)
+    return np.array([emb.vector for emb in response.embeddings], dtype=np.float32)
+
+
+def encode_matrix(embeddings, encoding):
+    return model_pb2.EmbeddingResponse(
+        matrix=model_pb2.EmbeddingMatrix(
+            data=np.ascontiguousarray(embeddings, dtype=DTYPES[encoding]).tobytes(),
+            shape=list(embeddings.shape),
+            dtype=encoding,
+        )
+    ).SerializeToString()
+
+
+def decode_matrix(data):
+    matrix = model_pb2.EmbeddingResponse.FromString(data).matrix
+    embeddings = np.frombuffer(matrix.data, dtype=DTYPES[matrix.dtype]).reshape(tuple(matrix.shape))
+    return embeddings.astype(np.float32, copy=False)
+
+
+def measure(fn, *args, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        result = fn(*args)
+    return (time.perf_counter() - start) / repeats * 1000, result
+
+
+def compare_encodings(n_texts, dim, repeats=20):
+    embeddings = np.random.default_rng(0).standard_normal((n_texts, dim)).astype(np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    print(f"\n🔹 Эмбеддинги: {n_texts} x {dim}")
+
+    variants = {
+        "list": (lambda e: encode_list(e), decode_list),
+        "float32": (lambda e: encode_matrix(e, model_pb2.FLOAT32), decode_matrix),
+        "float16": (lambda e: encode_matrix(e, model_pb2.FLOAT16), decode_matrix),
+    }
+
+    for name, (encode, decode) in variants.items():
+        encode_ms, data = measure(encode, embeddings, repeats=repeats)
+        decode_ms, decoded = measure(decode, data, repeats=repeats)
+        error = np.abs(decoded - embeddings).max()
+
+        print(
+            f"{name:>8}: размер {len(data) / 1024:9.1f} KB, "
+            f"сервер {encode_ms:8.3f} мс, клиент {decode_ms:8.3f} мс, "
+            f"макс. ошибка {error:.2e}"
+        )
+
+
+if __name__ == "__main__":
+    for n_texts in (1, 32, 256):
+        compare_encodings(n_texts=n_texts, dim=1024)
@@ -0,0 +1,6 @@
+from fastapi import Request
+from search_service.infrastructure.cache import SingleFlight
+
+
+def get_single_flight(request: Request) -> SingleFlight:
+    return request.app.state.container.single_flight
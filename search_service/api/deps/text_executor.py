@@ -0,0 +1,6 @@
+from fastapi import Request
+from search_service.text_processing.executor import TextExecutor
+
+
+def get_text_executor(request: Request) -> TextExecutor:
+    return request.app.state.container.text_executor
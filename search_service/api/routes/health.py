@@ -1,6 +1,8 @@
 # api/routes/health.py
-from typing import Dict
-from fastapi import APIRouter
+from typing import Dict, List
+from fastapi import APIRouter, Depends
+from search_service.api.deps.container import get_container
+from search_service.container.di import Container
 
 router = APIRouter(tags=["Health"])
 
@@ -13,3 +15,17 @@ async def health() -> Dict:
         Dict: Статус сервиса
     """
     return {"status": "ok"}
+
+
+@router.get("/health/cache")
+async def cache_stats(
+        container: Container = Depends(get_container)
+) -> List[Dict]:
+    """
+    GET - метод для получения метрик кэшей сервиса (размер, попадания, промахи)
+    Args:
+        container (Container): di-контейнер
+    Returns:
+        List[Dict]: Метрики кэшей
+    """
+    return [cache.stats() for cache in container.caches()]
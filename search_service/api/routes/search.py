@@ -5,6 +5,9 @@ from fastapi.responses import JSONResponse
 from search_service.service.core.search_engine import SemanticSearchEngine
 from search_service.api.schemas.search import SearchRequest
 from search_service.api.deps.searcher import get_searcher
+from search_service.api.deps.single_flight import get_single_flight
+from search_service.infrastructure.cache import SingleFlight
+import json
 from search_service.config import Config
 import logging
 
@@ -48,7 +51,8 @@ def get_metadata(
 @router.post("/")
 async def search(
         request: SearchRequest,
-        searcher: SemanticSearchEngine = Depends(get_searcher)
+        searcher: SemanticSearchEngine = Depends(get_searcher),
+        single_flight: SingleFlight = Depends(get_single_flight)
 ) -> JSONResponse:
     """
     Выполняет поиск схожих запросов по заданным параметрам.
@@ -69,6 +73,7 @@ async def search(
                 exact (bool, optional): Включение быстрого поиска по индексированным векторам.
                 filter (dict, optional): Фильтры для сужения поиска, например, по дате или клиенту.
         searcher (SemanticSearchEngine): Движок для поиска
+        single_flight (SingleFlight): Объединение одинаковых одновременных запросов
 
     Returns:
         JSON: Список найденных схожих запросов с соответствующими метаданными.
@@ -84,14 +89,20 @@ async def search(
         f"filters={request.filter}"
     )
 
-    result = await searcher.search(
-        request.query,
-        request.product,
-        request.mode,
-        limit=request.limit,
-        alpha=request.alpha,
-        exact=request.exact,
-        filters=request.filter,
+    # Одинаковые одновременные запросы ожидают один общий поиск
+    key = ("search", json.dumps(request.model_dump(mode="json"), sort_keys=True, ensure_ascii=False))
+
+    result = await single_flight.do(
+        key,
+        lambda: searcher.search(
+            request.query,
+            request.product,
+            request.mode,
+            limit=request.limit,
+            alpha=request.alpha,
+            exact=request.exact,
+            filters=request.filter,
+        )
     )
     log.info(f"Result search request : {result}")
 
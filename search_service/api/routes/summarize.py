@@ -1,10 +1,15 @@
 # api/routes/summarize.py
 from fastapi import APIRouter, Depends
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from search_service.infrastructure.clients.summarization_orchestrator import SummarizationOrchestrator
-from search_service.text_processing.text_preparation import transforms_llm, transforms_comments
+from search_service.text_processing.executor import TextExecutor
 from search_service.api.schemas.summarization import SummarizeRequest
 from search_service.api.deps.orchestrator import get_orchestrator
+from search_service.api.deps.single_flight import get_single_flight
+from search_service.api.deps.text_executor import get_text_executor
+from search_service.infrastructure.cache import SingleFlight
+from typing import AsyncIterator, Optional, Tuple
+import json
 import logging
 
 log = logging.getLogger(__name__)
@@ -12,10 +17,44 @@ log = logging.getLogger(__name__)
 router = APIRouter(prefix="/summarization", tags=["Summarize"])
 
 
+async def _prepare(request: SummarizeRequest,
+                   text_executor: TextExecutor) -> Tuple[str, Optional[str]]:
+    """
+    Очистка текста и комментариев (при наличии) запроса на суммаризацию
+    Args:
+        request (SummarizeRequest): Данные для суммаризации
+        text_executor (TextExecutor): Выполнение обработки текста вне event loop
+    Returns:
+        Tuple[str, Optional[str]]: Подготовленные текст и комментарии
+    """
+    text = await text_executor.run("llm", request.text)
+
+    comments = None
+    if request.comments:
+        comments = await text_executor.run("comments", request.comments)
+
+    return text, comments
+
+
+def _sse(data: dict, event: Optional[str] = None) -> str:
+    """
+    Формирование события Server-Sent Events
+    Args:
+        data (dict): Данные события
+        event (str, None): Тип события, None - сообщение по умолчанию
+    Returns:
+        str: Событие в формате text/event-stream
+    """
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 @router.post("/")
 async def summarize(
         request: SummarizeRequest,
-        orchestrator: SummarizationOrchestrator = Depends(get_orchestrator)
+        orchestrator: SummarizationOrchestrator = Depends(get_orchestrator),
+        single_flight: SingleFlight = Depends(get_single_flight),
+        text_executor: TextExecutor = Depends(get_text_executor)
 ):
     """
     POST - метод для суммаризации текста
@@ -25,23 +64,65 @@ async def summarize(
                 text: строка, которую нужно суммаризировать
                 comments: Комментарии запроса
         orchestrator (SummarizationOrchestrator): оркестратор для суммаризации
+        single_flight (SingleFlight): Объединение одинаковых одновременных запросов
+        text_executor (TextExecutor): Выполнение обработки текста вне event loop
     """
 
     # Применяем очистку текста и комментариев (при наличии)
-    text = transforms_llm(text=request.text)["text"]
-
-    comments = None
-    if request.comments:
-        comments = transforms_comments(text=request.comments)["text"]
+    text, comments = await _prepare(request, text_executor)
 
     log.info(f"Request on summarization {text}")
 
-    summary = await orchestrator.summarize(
-        problem=text,
-        comments=comments,
-        max_concurrent=1,
+    # Одинаковые одновременные запросы ожидают одну общую суммаризацию
+    summary = await single_flight.do(
+        ("summarize", text, comments),
+        lambda: orchestrator.summarize(
+            problem=text,
+            comments=comments,
+        )
     )
 
     return JSONResponse({"summary": summary})
 
 
+@router.post("/stream")
+async def summarize_stream(
+        request: SummarizeRequest,
+        orchestrator: SummarizationOrchestrator = Depends(get_orchestrator),
+        text_executor: TextExecutor = Depends(get_text_executor)
+):
+    """
+    POST - метод для потоковой суммаризации текста (Server-Sent Events).
+        Фрагменты ответа отдаются по мере генерации событиями с полем text,
+        завершение - событие end, ошибка - событие error.
+        При отключении клиента генерация в сервисе моделей отменяется
+    Args:
+        request (SummarizeRequest): pydantic класс, содержащий валидируемые данные для суммаризации.
+            Ожидается, что тело запроса содержит JSON с полями:
+                text: строка, которую нужно суммаризировать
+                comments: Комментарии запроса
+        orchestrator (SummarizationOrchestrator): оркестратор для суммаризации
+        text_executor (TextExecutor): Выполнение обработки текста вне event loop
+    """
+    text, comments = await _prepare(request, text_executor)
+
+    log.info(f"Request on streaming summarization {text}")
+
+    async def events() -> AsyncIterator[str]:
+        try:
+            async for chunk in orchestrator.summarize_stream(
+                problem=text,
+                comments=comments,
+            ):
+                yield _sse({"text": chunk})
+        except Exception as e:
+            log.exception(f"Streaming summarization failed: {e}")
+            yield _sse({"detail": "Summarization failed"}, event="error")
+            return
+        yield _sse({}, event="end")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
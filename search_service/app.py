@@ -45,11 +45,14 @@ async def lifespan(app: FastAPI):
     log.info("System is READY")
 
     asyncio.create_task(updater.background_updater())
+    asyncio.create_task(updater.background_refresher())
 
     yield
 
     log.info("Shutting down application...")
 
+    container.text_executor.shutdown()
+
 app = FastAPI(lifespan=lifespan)
 
 # Подключаем CORS
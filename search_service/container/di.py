@@ -5,6 +5,9 @@ from search_service.infrastructure.db.relational_db.relational_db import Relatio
 from search_service.infrastructure.db.vector_db.client import VectorDB
 from search_service.infrastructure.clients.model_client import ModelServiceClient
 from search_service.infrastructure.clients.summarization_orchestrator import SummarizationOrchestrator
+from search_service.infrastructure.cache import LRUCache, SingleFlight
+from search_service.text_processing.executor import TextExecutor
+import json
 from search_service.config import Config
 
 log = logging.getLogger(__name__)
@@ -22,7 +25,8 @@ class Container:
         self.model_client = ModelServiceClient(
             cfg.model["url"],
             cfg.model["timeouts"]["timeout_generate"],
-            cfg.model["timeouts"]["timeout_embed"]
+            cfg.model["timeouts"]["timeout_embed"],
+            cfg.model["embedding_encoding"],
         )
 
         log.info("Init relational db client")
@@ -39,6 +43,38 @@ class Container:
             self.model_client
         )
 
+        log.info("Init text processing executor")
+        self.text_executor = TextExecutor(
+            thread_workers=cfg.service["text_processing"]["thread_workers"],
+            process_workers=cfg.service["text_processing"]["process_workers"],
+        )
+
+        log.info("Init query embedding cache")
+        self.embedding_cache = LRUCache(
+            max_size=cfg.model["embedding_cache"]["max_size"],
+            ttl=cfg.model["embedding_cache"]["ttl"],
+            name="query_embedding",
+        )
+
+        log.info("Init search result cache")
+        self.result_cache = LRUCache(
+            max_bytes=cfg.service["searcher"]["result_cache"]["max_bytes"],
+            ttl=cfg.service["searcher"]["result_cache"]["ttl"],
+            name="search_result",
+            sizeof=lambda value: len(json.dumps(value, ensure_ascii=False).encode("utf-8")),
+        )
+
+        # Объединение одинаковых одновременных запросов поиска и суммаризации
+        self.single_flight = SingleFlight(name="requests")
+
+    def caches(self) -> list:
+        """
+        Кэши сервиса, объединение запросов и кэши лемм (для метрик)
+        Returns:
+            list: Объекты с методом stats()
+        """
+        return [self.embedding_cache, self.result_cache, self.single_flight, self.text_executor]
+
     @classmethod
     async def create(cls) -> "Container":
         """
@@ -48,4 +48,48 @@ export async function summarize(payload) {
   });
 
   return await response.json();
-}
\ No newline at end of file
+}
+// Потоковая суммаризация (Server-Sent Events): onText вызывается для каждого фрагмента ответа
+export async function summarizeStream(payload, onText) {
+  const response = await fetch("/summarization/stream", {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json"
+    },
+    body: JSON.stringify(payload)
+  });
+
+  if (!response.ok) {
+    throw new Error(`HTTP ${response.status}`);
+  }
+
+  const reader = response.body.pipeThrough(new TextDecoderStream()).getReader();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) {
+      throw new Error("Поток прерван");
+    }
+    buffer += value;
+
+    // События разделяются пустой строкой
+    let boundary;
+    while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+      const rawEvent = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+
+      let event = "message";
+      let data = "";
+      for (const line of rawEvent.split("\n")) {
+        if (line.startsWith("event: ")) event = line.slice(7);
+        else if (line.startsWith("data: ")) data += line.slice(6);
+      }
+
+      const parsed = data ? JSON.parse(data) : {};
+      if (event === "end") return;
+      if (event === "error") throw new Error(parsed.detail);
+      onText(parsed.text);
+    }
+  }
+}
@@ -1,4 +1,4 @@
-import { getProducts, getClients, searchRequests, summarize } from "./api.js";
+import { getProducts, getClients, searchRequests, summarizeStream } from "./api.js";
 import { buildPayloadSearch, buildPayloadSum } from "./form.js";
 import {
   showLoading,
@@ -97,8 +97,12 @@ summaryForm?.addEventListener("submit", async (e) => {
 
   try {
     const payload = buildPayloadSum();
-    const data = await summarize(payload);
-    summaryResult.innerText = data.summary;
+    // Текст суммаризации выводится по мере генерации
+    let summary = "";
+    await summarizeStream(payload, (text) => {
+      summary += text;
+      summaryResult.innerText = summary;
+    });
 
     btnSum.classList.remove("onclic");
     btnSum.classList.add("validate");
@@ -0,0 +1,4 @@
+# search_service/infrastructure/cache/__init__.py
+
+from .lru import LRUCache
+from .single_flight import SingleFlight
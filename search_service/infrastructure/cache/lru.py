@@ -0,0 +1,137 @@
+from typing import Any, Callable, Dict, Hashable, Optional
+from collections import OrderedDict
+import threading
+import time
+import logging
+
+log = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class LRUCache:
+    """
+    In-process кэш с вытеснением давно неиспользуемых записей (LRU)
+        и опциональным временем жизни записей (TTL)
+    """
+    def __init__(self,
+                 max_size: Optional[int] = None,
+                 ttl: Optional[float] = None,
+                 name: str = "cache",
+                 max_bytes: Optional[int] = None,
+                 sizeof: Optional[Callable[[Any], int]] = None):
+        """
+        Args:
+            max_size (int, None): Максимальное количество записей
+            ttl (float, None): Время жизни записи в секундах, None - без ограничения
+            name (str): Название кэша для логов и метрик
+            max_bytes (int, None): Ограничение суммарного размера записей в байтах
+            sizeof (Callable, None): Функция оценки размера значения в байтах (обязательна для max_bytes)
+        """
+        if max_size is None and max_bytes is None:
+            raise ValueError("max_size or max_bytes must be set")
+        if max_size is not None and max_size <= 0:
+            raise ValueError("max_size must be positive")
+        if max_bytes is not None and sizeof is None:
+            raise ValueError("sizeof is required when max_bytes is set")
+
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.ttl = ttl
+        self.name = name
+
+        self._data: "OrderedDict[Hashable, tuple[float, int, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """
+        Получение значения по ключу
+        Args:
+            key (Hashable): Ключ
+            default (Any): Значение, если записи нет или она устарела
+        Returns:
+            Any: Значение из кэша
+        """
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+
+            if item is _MISSING:
+                self.misses += 1
+                return default
+
+            created, size, value = item
+            if self.ttl is not None and time.monotonic() - created > self.ttl:
+                del self._data[key]
+                self._bytes -= size
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any):
+        """
+        Сохранение значения, при переполнении вытесняется самая старая запись
+        Args:
+            key (Hashable): Ключ
+            value (Any): Значение
+        """
+        size = self.sizeof(value) if self.sizeof is not None else 0
+
+        if self.max_bytes is not None and size > self.max_bytes:
+            log.debug(f"Value is too large for cache '{self.name}' ({size} bytes), skipped")
+            return
+
+        with self._lock:
+            previous = self._data.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+
+            self._data[key] = (time.monotonic(), size, value)
+            self._bytes += size
+
+            while self._overflow():
+                _, (_, evicted_size, _) = self._data.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+
+    def _overflow(self) -> bool:
+        """Превышены ли ограничения кэша по количеству записей или размеру"""
+        if self.max_size is not None and len(self._data) > self.max_size:
+            return True
+        return self.max_bytes is not None and self._bytes > self.max_bytes
+
+    def clear(self):
+        """Очистка кэша"""
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        """
+        Метрики кэша
+        Returns:
+            Dict: Размер, попадания, промахи, вытеснения и доля попаданий
+        """
+        total = self.hits + self.misses
+        return {
+            "name": self.name,
+            "size": len(self._data),
+            "max_size": self.max_size,
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+        }
@@ -0,0 +1,93 @@
+from typing import Any, Awaitable, Callable, Dict, Hashable
+from dataclasses import dataclass
+import asyncio
+import logging
+
+log = logging.getLogger(__name__)
+
+
+@dataclass
+class _Flight:
+    """Выполняющееся вычисление и количество ожидающих его вызовов"""
+    task: asyncio.Task
+    waiters: int = 0
+
+
+class SingleFlight:
+    """
+    Объединение одинаковых одновременных вычислений:
+        пока вычисление по ключу выполняется, повторные вызовы
+        ожидают его результат, а не запускают свое.
+        Когда отменяются все ожидающие вызовы (клиенты отключились), вычисление отменяется
+    """
+    def __init__(self, name: str = "single_flight"):
+        """
+        Args:
+            name (str): Название для логов и метрик
+        """
+        self.name = name
+        self._in_flight: Dict[Hashable, _Flight] = {}
+
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Выполнение вычисления или ожидание уже запущенного по тому же ключу
+        Args:
+            key (Hashable): Ключ вычисления
+            fn (Callable[[], Awaitable[Any]]): Фабрика корутины вычисления
+        Returns:
+            Any: Результат вычисления
+        """
+        self.calls += 1
+
+        flight = self._in_flight.get(key)
+        if flight is not None:
+            self.shared += 1
+            log.info(f"Joined in-flight computation in '{self.name}', in flight - {len(self._in_flight)}")
+        else:
+            # Вычисление выполняется отдельной задачей, чтобы отмена одного
+            # из ожидающих запросов (разрыв соединения) не отменяла его для остальных
+            flight = _Flight(task=asyncio.ensure_future(fn()))
+            self._in_flight[key] = flight
+            flight.task.add_done_callback(lambda _: self._done(key, flight))
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        except asyncio.CancelledError:
+            if flight.waiters == 1 and not flight.task.done():
+                # Результат больше никто не ожидает, новые вызовы запускают свое вычисление
+                log.info(f"Cancelled computation in '{self.name}': no waiters left")
+                self._forget(key, flight)
+                flight.task.cancel()
+            raise
+        finally:
+            flight.waiters -= 1
+
+    def _forget(self, key: Hashable, flight: _Flight):
+        """Удаление вычисления из выполняющихся"""
+        if self._in_flight.get(key) is flight:
+            del self._in_flight[key]
+
+    def _done(self, key: Hashable, flight: _Flight):
+        """Удаление завершенного вычисления"""
+        self._forget(key, flight)
+
+        # Помечаем исключение полученным, если все ожидающие были отменены
+        if not flight.task.cancelled():
+            flight.task.exception()
+
+    def stats(self) -> Dict:
+        """
+        Метрики объединения вычислений
+        Returns:
+            Dict: Количество вызовов, объединенных вызовов и выполняющихся вычислений
+        """
+        return {
+            "name": self.name,
+            "calls": self.calls,
+            "shared": self.shared,
+            "in_flight": len(self._in_flight),
+        }
@@ -14,6 +14,8 @@ class LLMSettings:
     generation_tokens: int = cfg["generation_tokens"]
     token_safety_ratio: float = cfg["token_safety_ratio"]
     chars_per_token: int = cfg["chars_per_token"]
+    # Количество чанков одного запроса, суммаризируемых одновременно
+    max_concurrent: int = cfg.get("max_concurrent") or 1
 
     default_empty_comments: str = "отсутствуют"
 
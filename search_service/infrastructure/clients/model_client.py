@@ -1,4 +1,4 @@
-from typing import List, Union
+from typing import AsyncIterator, List, Union
 
 import grpc.aio
 import numpy as np
@@ -10,6 +10,24 @@ import logging
 
 log = logging.getLogger(__name__)
 
+# Формат передачи эмбеддингов: list - repeated float (совместимость со старым сервисом моделей),
+# float32/float16 - упакованный буфер
+EMBEDDING_ENCODINGS = {
+    "list": model_pb2.FLOAT_LIST,                                          # type: ignore
+    "float32": model_pb2.FLOAT32,                                          # type: ignore
+    "float16": model_pb2.FLOAT16,                                          # type: ignore
+}
+# Класс приоритета запроса: interactive (поиск, суммаризация по запросу пользователя)
+# обслуживается сервисом моделей раньше bulk (обновление данных)
+PRIORITIES = {
+    "interactive": model_pb2.INTERACTIVE,                                  # type: ignore
+    "bulk": model_pb2.BULK,                                                # type: ignore
+}
+MATRIX_DTYPES = {
+    model_pb2.FLOAT32: np.dtype("<f4"),                                    # type: ignore
+    model_pb2.FLOAT16: np.dtype("<f2"),                                    # type: ignore
+}
+
 
 class ModelServiceClient:
     """
@@ -18,13 +36,15 @@ class ModelServiceClient:
     def __init__(self,
                  url: str,
                  timeout_generate=90,
-                 timeout_embed=90
+                 timeout_embed=90,
+                 embedding_encoding="float32"
                  ):
         self._channel = grpc.aio.insecure_channel(url)
         self.stub = model_pb2_grpc.ModelServiceStub(self._channel)
 
         self.timeout_generate = timeout_generate
         self.timeout_embed = timeout_embed
+        self.embedding_encoding = EMBEDDING_ENCODINGS[embedding_encoding or "float32"]
 
     async def __aenter__(self):
         return self
@@ -33,11 +53,12 @@ class ModelServiceClient:
         await self._channel.close()
 
     @grpc_retry()
-    async def generate(self, prompt: str) -> str:
+    async def generate(self, prompt: str, priority: str = "interactive") -> str:
         """
         Выполняет gRPC запрос к LLM модели
         Args:
             prompt (str): Промпт для LLM модели
+            priority (str): interactive/bulk - класс приоритета запроса
         Returns:
             str: Ответ LLM модели
         """
@@ -47,39 +68,116 @@ class ModelServiceClient:
             model_pb2.GenerateRequest(                                     # type: ignore
                 prompt=prompt,
                 max_tokens=settings.generation_tokens,
+                priority=PRIORITIES[priority],
             ),
             timeout=self.timeout_generate,
         )
         return response.text
 
-    @grpc_retry()
+    async def generate_stream(self, prompt: str, priority: str = "interactive") -> AsyncIterator[str]:
+        """
+        Выполняет потоковый gRPC запрос к LLM модели.
+            Повтор не выполняется - часть текста уже могла быть отдана клиенту.
+            При прерывании итерации вызов отменяется и сервис моделей останавливает генерацию
+        Args:
+            prompt (str): Промпт для LLM модели
+            priority (str): interactive/bulk - класс приоритета запроса
+        Returns:
+            AsyncIterator[str]: Фрагменты ответа LLM модели
+        """
+        log.debug(f"Prompt for streaming summarization:\n{prompt}")
+
+        call = self.stub.GenerateStream(
+            model_pb2.GenerateRequest(                                     # type: ignore
+                prompt=prompt,
+                max_tokens=settings.generation_tokens,
+                priority=PRIORITIES[priority],
+            ),
+            timeout=self.timeout_generate,
+        )
+        try:
+            async for chunk in call:
+                yield chunk.text
+        finally:
+            call.cancel()
+
     async def embed(
             self,
             texts: Union[str, List[str]],
-            prefix: str) -> np.ndarray:
+            prefix: str,
+            priority: str = "interactive") -> np.ndarray:
         """
         Выполняет gRPC запрос к Embedding модели
         Args:
             texts (Union[str, List[str]]): Строки(а) для получения эмбеддинга
             prefix (str): query/passage. query - для поиска passage - для сохранения в БД
+            priority (str): interactive/bulk - класс приоритета запроса
         Returns:
             np.ndarray: Эмбеддинг текста
         """
         if isinstance(texts, str):
             texts = [texts]
 
+        embeddings = await self.embed_many(texts, prefix, priority)
+
+        return embeddings[0]
+
+    @grpc_retry()
+    async def embed_many(
+            self,
+            texts: List[str],
+            prefix: str,
+            priority: str = "interactive") -> np.ndarray:
+        """
+        Выполняет один gRPC запрос к Embedding модели для списка текстов
+        Args:
+            texts (List[str]): Строки для получения эмбеддингов
+            prefix (str): query/passage. query - для поиска passage - для сохранения в БД
+            priority (str): interactive/bulk - класс приоритета запроса
+        Returns:
+            np.ndarray: Эмбеддинги текстов, размер (N, dim)
+        """
         response = await self.stub.Embed(
             model_pb2.EmbeddingRequest(                                    # type: ignore
                 texts=texts,
                 prefix=prefix,
+                encoding=self.embedding_encoding,
+                priority=PRIORITIES[priority],
             ),
             timeout=self.timeout_embed,
         )
 
-        if not response.embeddings:
+        if response.HasField("matrix"):
+            embeddings = self._decode_matrix(response.matrix)
+        elif response.embeddings:
+            # Сервис моделей без поддержки упакованного формата
+            embeddings = np.array(
+                [embedding.vector for embedding in response.embeddings],
+                dtype=np.float32,
+            )
+        else:
             raise ValueError("Empty embeddings response")
 
-        return np.array(
-            response.embeddings[0].vector,
-            dtype=np.float32,
-        )
+        if len(embeddings) != len(texts):
+            raise ValueError(
+                f"Embeddings count mismatch: expected {len(texts)}, got {len(embeddings)}"
+            )
+
+        return embeddings
+
+    @staticmethod
+    def _decode_matrix(matrix) -> np.ndarray:
+        """
+        Восстановление матрицы эмбеддингов из упакованного буфера
+        Args:
+            matrix (model_pb2.EmbeddingMatrix): Буфер, размерность и тип эмбеддингов
+        Returns:
+            np.ndarray: Эмбеддинги float32, размер (N, dim)
+        """
+        dtype = MATRIX_DTYPES.get(matrix.dtype)
+        if dtype is None:
+            raise ValueError(f"Unsupported embeddings dtype: {matrix.dtype}")
+
+        # Для float32 - представление над буфером без копирования
+        embeddings = np.frombuffer(matrix.data, dtype=dtype).reshape(tuple(matrix.shape))
+        return embeddings.astype(np.float32, copy=False)
@@ -1,7 +1,7 @@
 import json
 import logging
 import asyncio
-from typing import List
+from typing import AsyncIterator, List, Optional
 
 from search_service.infrastructure.clients.summarization_builder import build_summarization_prompts
 from search_service.infrastructure.clients.llm_settings import LLMSettings as settings
@@ -16,38 +16,53 @@ class SummarizationOrchestrator:
     def __init__(self, client):
         self.client = client
 
-    async def _generate(self, prompt: str) -> str:
+    async def _generate(self,
+                        prompt: str,
+                        priority: str,
+                        semaphore: Optional[asyncio.Semaphore] = None) -> str:
         """
         Внутренний метод для генерации
         Args:
             prompt (str): Промпт для LLM
+            priority (str): interactive/bulk - класс приоритета запроса
+            semaphore (asyncio.Semaphore, None): Ограничение одновременных запросов генерации
         Returns:
             result (str): Результат генерации (суммаризации)
         """
-        result = await self.client.generate(prompt)
+        if semaphore is None:
+            result = await self.client.generate(prompt, priority=priority)
+        else:
+            async with semaphore:
+                result = await self.client.generate(prompt, priority=priority)
         log.info(f"Result summarization:\n{result}")
         return result
 
     async def _map_phase(self,
                          prompts: List[str],
-                         max_concurrent: int) -> List[str]:
+                         max_concurrent: Optional[int],
+                         priority: str,
+                         semaphore: Optional[asyncio.Semaphore] = None) -> List[str]:
         """
-        Поочередная суммаризация чанков одного запроса
+        Одновременная суммаризация чанков одного запроса
         Args:
             prompts (List[str]): Промпты для LLM
-            max_concurrent (int): Количество одновременно (почти) выполняющихся запросов
+            max_concurrent (int, None): Количество одновременно (почти) выполняющихся запросов,
+                None - значение из настроек (max_concurrent в model.chunking)
+            priority (str): interactive/bulk - класс приоритета запроса
+            semaphore (asyncio.Semaphore, None): Общее ограничение одновременных запросов генерации,
+                заменяет max_concurrent
         Returns:
             summaries (List[str]): Список суммаризированных чанков
         """
-
-        semaphore = asyncio.Semaphore(max_concurrent)  # Ограничиваем одновременное количество запросов
+        if semaphore is None:
+            # Ограничиваем одновременное количество запросов
+            semaphore = asyncio.Semaphore(max_concurrent or settings.max_concurrent)
 
         async def limited_generate(prompt: str, idx: int) -> str:
-            async with semaphore:
-                log.info(f"Start summarization for chunk {idx + 1}/{len(prompts)}")
-                result = await self._generate(prompt)
-                log.info(f"Summarization for chunk {idx + 1}/{len(prompts)} - finish")
-                return result
+            log.info(f"Start summarization for chunk {idx + 1}/{len(prompts)}")
+            result = await self._generate(prompt, priority, semaphore)
+            log.info(f"Summarization for chunk {idx + 1}/{len(prompts)} - finish")
+            return result
 
         tasks = [limited_generate(p, i) for i, p in enumerate(prompts)]
 
@@ -62,42 +77,51 @@ class SummarizationOrchestrator:
 
         return summaries
 
-    async def _reduce_phase(self, summaries: List[str]) -> str:
+    @staticmethod
+    def _reduce_prompt(summaries: List[str]) -> str:
         """
-        Суммаризация суммаризированных чанков
+        Промпт для суммаризации суммаризированных чанков
         Args:
             summaries (List[str]): Суммаризированные чанки
         Returns:
-            str: Результат суммаризации
+            str: Промпт для LLM
         """
         summaries_text = "\n\n".join(
             json.dumps(s, ensure_ascii=False)
             for s in summaries
         )
 
-        final_prompt = settings.prompt_template.format(
+        return settings.prompt_template.format(
             problem=summaries_text,
             comments=settings.default_empty_comments,
         )
 
+    async def _reduce_phase(self,
+                            summaries: List[str],
+                            priority: str,
+                            semaphore: Optional[asyncio.Semaphore] = None) -> str:
+        """
+        Суммаризация суммаризированных чанков
+        Args:
+            summaries (List[str]): Суммаризированные чанки
+            priority (str): interactive/bulk - класс приоритета запроса
+            semaphore (asyncio.Semaphore, None): Ограничение одновременных запросов генерации
+        Returns:
+            str: Результат суммаризации
+        """
         log.info("Result for chunked summarization:")
-        return await self._generate(final_prompt)
+        return await self._generate(self._reduce_prompt(summaries), priority, semaphore)
 
-    async def summarize(self,
-                        problem: str,
-                        comments: str,
-                        max_concurrent: int) -> str:
+    def _build_prompts(self, problem: str, comments: str) -> List[str]:
         """
-        Суммаризация запроса по проблеме и комментариям
+        Разбиение запроса на промпты под размер контекста LLM
         Args:
             problem (str): Описание проблемы
             comments (str): Комментарии
-            max_concurrent (int): Количество одновременно (почти) выполняющихся запросов
         Returns:
-            str: Результат суммаризации
+            List[str]: Промпты для LLM (один, если запрос помещается в контекст)
         """
-
-        prompts = build_summarization_prompts(
+        return build_summarization_prompts(
             problem=problem,
             comments=comments,
             max_context_tokens=settings.max_context_tokens,
@@ -105,15 +129,71 @@ class SummarizationOrchestrator:
             token_safety_ratio=settings.token_safety_ratio,
         )
 
+    async def summarize(self,
+                        problem: str,
+                        comments: str,
+                        max_concurrent: Optional[int] = None,
+                        priority: str = "interactive",
+                        semaphore: Optional[asyncio.Semaphore] = None) -> str:
+        """
+        Суммаризация запроса по проблеме и комментариям
+        Args:
+            problem (str): Описание проблемы
+            comments (str): Комментарии
+            max_concurrent (int, None): Количество одновременно (почти) выполняющихся запросов
+                по чанкам, None - значение из настроек (max_concurrent в model.chunking)
+            priority (str): interactive - запрос пользователя, bulk - обновление данных
+            semaphore (asyncio.Semaphore, None): Общее ограничение одновременных запросов генерации
+                нескольких суммаризаций (все запросы этой суммаризации выполняются под ним),
+                None - ограничение max_concurrent только для чанков
+        Returns:
+            str: Результат суммаризации
+        """
+
+        prompts = self._build_prompts(problem, comments)
+
         # простой кейс
         if len(prompts) == 1:
-            return await self._generate(prompts[0])
+            return await self._generate(prompts[0], priority, semaphore)
 
         log.info(f"Using chunked summarization, count chunks - {len(prompts)}")
 
-        summaries = await self._map_phase(prompts, max_concurrent)
+        summaries = await self._map_phase(prompts, max_concurrent, priority, semaphore)
 
         if not summaries:
             raise RuntimeError("Failed to summarize any chunk")
 
-        return await self._reduce_phase(summaries)
+        return await self._reduce_phase(summaries, priority, semaphore)
+
+    async def summarize_stream(self,
+                               problem: str,
+                               comments: str,
+                               max_concurrent: Optional[int] = None) -> AsyncIterator[str]:
+        """
+        Потоковая суммаризация запроса по проблеме и комментариям.
+            Для разбитого на чанки запроса map-фаза выполняется целиком,
+            потоком отдается только итоговая (reduce) генерация
+        Args:
+            problem (str): Описание проблемы
+            comments (str): Комментарии
+            max_concurrent (int, None): Количество одновременно (почти) выполняющихся запросов
+                по чанкам, None - значение из настроек (max_concurrent в model.chunking)
+        Returns:
+            AsyncIterator[str]: Фрагменты результата суммаризации
+        """
+        prompts = self._build_prompts(problem, comments)
+
+        if len(prompts) == 1:
+            final_prompt = prompts[0]
+        else:
+            log.info(f"Using chunked streaming summarization, count chunks - {len(prompts)}")
+
+            summaries = await self._map_phase(prompts, max_concurrent, "interactive")
+
+            if not summaries:
+                raise RuntimeError("Failed to summarize any chunk")
+
+            final_prompt = self._reduce_prompt(summaries)
+
+        async for text in self.client.generate_stream(final_prompt):
+            yield text
@@ -1,4 +1,4 @@
-SELECT servicecall, emp.fio, admission_prority
+SELECT req.number, servicecall, emp.fio, admission_prority
 FROM request req
 left join employee emp on req.resp_user=emp.id
 WHERE number = ANY(:numbers)
@@ -4,11 +4,15 @@ select
     c.product,
     req.registry_date,
     req.date_end,
+    req.servicecall,
+    req.admission_prority,
+    emp.fio,
     req.problem as problem,
 	STRING_AGG(com.comments, ' ||| ' order by com.date_comments) as comments
 from request req
 left join comments com on req.number = com.number
 left join contract c on req.contract=c.id
+left join employee emp on req.resp_user=emp.id
 where req.date_end >= :from_date
 	and req.date_end < :to_date
 	and c.product in ('Naumen Erudite', 'NCC')
@@ -16,4 +20,5 @@ group by
     req.number,
     req.problem,
     req.client,
-    c.product;
\ No newline at end of file
+    c.product,
+    emp.fio;
@@ -68,7 +68,8 @@ class RelationalDatabaseTouch:
         """
         query = text(load_file(self.quires_dir / "additional_data.sql"))
         additional_data = await self.make_request(query, params)
-        log.info(f"Additional data received from relational db: {additional_data}")
+        log.info(f"Additional data received from relational db, count rows - {len(additional_data)}")
+        log.debug(f"Additional data: {additional_data}")
         return additional_data
 
     async def fetch_request_data(self, params: dict) -> List[Dict]:
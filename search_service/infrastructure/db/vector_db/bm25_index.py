@@ -0,0 +1,239 @@
+from typing import Dict, List, Iterable, Optional, Tuple
+from collections import Counter
+import math
+import numpy as np
+from search_service.text_processing.text_preparation import transforms_bm25
+import logging
+
+log = logging.getLogger(__name__)
+
+# Поля payload, в которых хранится предварительно подготовленный для BM25 текст
+BM25_PAYLOAD_FIELDS = {
+    "text": "bm25_text",
+    "comments": "bm25_comments",
+}
+
+
+def tokenize_bm25(text: Optional[str]) -> List[str]:
+    """
+    Подготовка текста для BM25 (лемматизация, очистка) и разбиение на токены
+    Args:
+        text (str, None): Исходный текст
+    Returns:
+        List[str]: Токены
+    """
+    if not text:
+        return []
+    return transforms_bm25(text)["text"].split()
+
+
+def payload_tokens(payload: dict, field: str) -> List[str]:
+    """
+    Получение токенов поля из payload точки.
+        Если точка сохранена до появления индекса и токенов в payload нет,
+        текст поля обрабатывается заново
+    Args:
+        payload (dict): Payload точки
+        field (str): Поле с текстом (text/comments)
+    Returns:
+        List[str]: Токены
+    """
+    tokens = payload.get(BM25_PAYLOAD_FIELDS[field])
+    if tokens is not None:
+        return tokens.split()
+    return tokenize_bm25(payload.get(field))
+
+
+class BM25Index:
+    """
+    Инвертированный индекс BM25 (Okapi) по одному текстовому полю коллекции.
+        Хранит posting-листы (термин -> строки документов и частоты),
+        длины документов и глобальный IDF, обновляется инкрементально
+    """
+    def __init__(self,
+                 k1: float = 1.5,
+                 b: float = 0.75,
+                 epsilon: float = 0.25):
+        """
+        Args:
+            k1 (float): Параметр насыщения частоты термина
+            b (float): Параметр нормализации по длине документа
+            epsilon (float): Доля от среднего IDF для терминов с отрицательным IDF
+        """
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+
+        self._rows: Dict[int, int] = {}                 # id точки -> строка
+        self._doc_len: List[int] = []                   # длина документа по строкам
+        self._doc_terms: List[Tuple[str, ...]] = []     # уникальные термины документа
+        self._postings: Dict[str, Dict[int, int]] = {}  # термин -> {строка: tf}
+        self._total_len = 0
+
+        # Кэши numpy-представлений, сбрасываются при обновлении
+        self._frozen: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._doc_len_arr: Optional[np.ndarray] = None
+        self._average_idf: Optional[float] = None
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def _remove_postings(self, row: int):
+        """Удаление документа из posting-листов (при повторном сохранении точки)"""
+        for term in self._doc_terms[row]:
+            posting = self._postings[term]
+            posting.pop(row, None)
+            if not posting:
+                del self._postings[term]
+            self._frozen.pop(term, None)
+        self._total_len -= self._doc_len[row]
+
+    def add(self, doc_id: int, tokens: List[str]):
+        """
+        Добавление или замена документа в индексе
+        Args:
+            doc_id (int): id точки
+            tokens (List[str]): Токены документа
+        """
+        counts = Counter(tokens)
+
+        row = self._rows.get(doc_id)
+        if row is None:
+            row = len(self._doc_len)
+            self._rows[doc_id] = row
+            self._doc_len.append(0)
+            self._doc_terms.append(())
+        else:
+            self._remove_postings(row)
+
+        for term, tf in counts.items():
+            self._postings.setdefault(term, {})[row] = tf
+            self._frozen.pop(term, None)
+
+        self._doc_len[row] = len(tokens)
+        self._doc_terms[row] = tuple(counts)
+        self._total_len += len(tokens)
+
+        self._doc_len_arr = None
+        self._average_idf = None
+
+    def add_many(self, docs: Iterable[Tuple[int, List[str]]]):
+        """
+        Добавление нескольких документов
+        Args:
+            docs (Iterable[Tuple[int, List[str]]]): Пары (id точки, токены)
+        """
+        for doc_id, tokens in docs:
+            self.add(doc_id, tokens)
+
+    def _idf(self, df: int) -> float:
+        n = len(self._doc_len)
+        return math.log(n - df + 0.5) - math.log(df + 0.5)
+
+    def _get_average_idf(self) -> float:
+        """Средний IDF по словарю (для замены отрицательных значений, как в BM25Okapi)"""
+        if self._average_idf is None:
+            if self._postings:
+                self._average_idf = sum(
+                    self._idf(len(p)) for p in self._postings.values()
+                ) / len(self._postings)
+            else:
+                self._average_idf = 0.0
+        return self._average_idf
+
+    def _get_posting(self, term: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """Posting-лист термина в виде отсортированных numpy-массивов (строки, tf)"""
+        frozen = self._frozen.get(term)
+        if frozen is None:
+            posting = self._postings.get(term)
+            if not posting:
+                return None
+            rows = np.fromiter(posting.keys(), dtype=np.int64, count=len(posting))
+            tfs = np.fromiter(posting.values(), dtype=np.float64, count=len(posting))
+            order = np.argsort(rows)
+            frozen = (rows[order], tfs[order])
+            self._frozen[term] = frozen
+        return frozen
+
+    def get_scores(self, query_tokens: List[str], doc_ids: List[int]) -> np.ndarray:
+        """
+        Вычисление BM25 для кандидатов
+        Args:
+            query_tokens (List[str]): Токены запроса
+            doc_ids (List[int]): id точек-кандидатов
+        Returns:
+            np.ndarray: BM25 для каждого кандидата (0 для отсутствующих в индексе)
+        """
+        scores = np.zeros(len(doc_ids), dtype=np.float64)
+        if not self._rows or not doc_ids or not query_tokens:
+            return scores
+
+        rows = np.fromiter(
+            (self._rows.get(i, -1) for i in doc_ids),
+            dtype=np.int64,
+            count=len(doc_ids)
+        )
+        known = rows >= 0
+
+        if self._doc_len_arr is None:
+            self._doc_len_arr = np.asarray(self._doc_len, dtype=np.float64)
+
+        avgdl = self._total_len / len(self._doc_len) or 1.0
+        doc_len = self._doc_len_arr[np.where(known, rows, 0)]
+        norm = self.k1 * (1 - self.b + self.b * doc_len / avgdl)
+
+        for term in query_tokens:
+            posting = self._get_posting(term)
+            if posting is None:
+                continue
+            posting_rows, posting_tfs = posting
+
+            idx = np.searchsorted(posting_rows, rows)
+            idx = np.minimum(idx, len(posting_rows) - 1)
+            match = known & (posting_rows[idx] == rows)
+            tf = np.where(match, posting_tfs[idx], 0.0)
+
+            idf = self._idf(len(posting_rows))
+            if idf < 0:
+                idf = self.epsilon * self._get_average_idf()
+
+            scores += idf * (tf * (self.k1 + 1) / (tf + norm))
+
+        return scores
+
+
+class CollectionBM25:
+    """
+    Набор BM25-индексов коллекции по полям: описание проблемы, комментарии и их объединение
+    """
+    FIELDS = ("text", "comments", "full")
+
+    def __init__(self):
+        self._indexes = {field: BM25Index() for field in self.FIELDS}
+
+    def index(self, field: str) -> BM25Index:
+        """
+        Получение индекса по полю
+        Args:
+            field (str): text/comments/full
+        Returns:
+            BM25Index: Индекс
+        """
+        return self._indexes[field]
+
+    def add_payload(self, doc_id: int, payload: dict):
+        """
+        Индексация точки по ее payload
+        Args:
+            doc_id (int): id точки
+            payload (dict): Payload точки
+        """
+        text_tokens = payload_tokens(payload, "text")
+        comments_tokens = payload_tokens(payload, "comments")
+
+        self._indexes["text"].add(doc_id, text_tokens)
+        self._indexes["comments"].add(doc_id, comments_tokens)
+        self._indexes["full"].add(doc_id, text_tokens + comments_tokens)
+
+    def __len__(self) -> int:
+        return len(self._indexes["text"])
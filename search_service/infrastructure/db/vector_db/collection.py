@@ -1,15 +1,21 @@
-from typing import List, Optional
+from typing import List, Optional, Dict, AsyncIterator
 from qdrant_client.models import (
     PointStruct,
     SearchParams,
     VectorParams,
     HnswConfigDiff,
     Distance,
-    QueryResponse
+    QueryResponse,
+    QueryRequest,
+    SetPayload,
+    SetPayloadOperation,
+    Record,
+    Filter,
 )
 from qdrant_client import AsyncQdrantClient
 from search_service.infrastructure.db.vector_db.filters import _build_filter
 from search_service.infrastructure.db.vector_db.metadata import CollectionMetadata
+from search_service.infrastructure.db.vector_db.bm25_index import CollectionBM25, BM25Index
 from dataclasses import asdict
 from datetime import datetime
 from search_service.infrastructure.retry.qdrant import qdrant_retry
@@ -17,6 +23,9 @@ import logging
 
 log = logging.getLogger(__name__)
 
+# Поля payload, необходимые для формирования результата поиска
+RESULT_PAYLOAD_FIELDS = ["registry_date", "responsible", "priority", "servicecall"]
+
 
 class CollectionStore:
 
@@ -36,6 +45,11 @@ class CollectionStore:
             "%Y-%m-%d"
         ).timestamp()
 
+        self._bm25 = CollectionBM25()
+
+        # Версия данных коллекции, увеличивается при каждом изменении точек
+        self._version = 0
+
     @classmethod
     async def create(
         cls,
@@ -116,7 +130,7 @@ class CollectionStore:
 
     async def _refresh_metadata(self):
         """
-        Полное обновление metadata при первом запуске приложения (дорогое)
+        Полное обновление metadata и построение BM25-индекса при первом запуске приложения (дорогое)
         """
 
         offset: Optional[int] = None
@@ -136,6 +150,8 @@ class CollectionStore:
             for p in points:
                 payload = p.payload or {}
 
+                self._bm25.add_payload(p.id, payload)
+
                 client = payload.get("client")
                 if client:
                     clients.add(client)
@@ -153,6 +169,8 @@ class CollectionStore:
         self._metadata.date_last_record = last_date
         self._metadata.points_count = collection_info.points_count
 
+        log.info(f"BM25 index for collection '{self._collection}' built, documents - {len(self._bm25)}")
+
     def _update_metadata_fast(self, points: List[PointStruct]):
         """
         Быстрое обновление metadata (без похода в БД)
@@ -173,6 +191,15 @@ class CollectionStore:
 
         self._metadata.points_count += len(points)
 
+    def _update_bm25(self, points: List[PointStruct]):
+        """
+        Инкрементальное обновление BM25-индекса сохраненными точками
+        Args:
+            points: (List[PointStruct]): Точки для индексации
+        """
+        for p in points:
+            self._bm25.add_payload(p.id, p.payload or {})
+
     @qdrant_retry()
     async def _upsert_with_retry(self, points: List[PointStruct]):
         """
@@ -208,41 +235,152 @@ class CollectionStore:
             log.error(f"Metadata update failed: {repr(e)}")
             log.warning("Metadata is out of sync with Qdrant")
 
+        try:
+            self._update_bm25(points)
+        except Exception as e:
+            log.error(f"BM25 index update failed: {repr(e)}")
+            log.warning("BM25 index is out of sync with Qdrant")
+
+        self._version += 1
+
         log.info(f"Points successfully saved to collection - '{self._collection}'")
 
     async def fetch_embeddings(
         self,
-        vector_name: str,
-        vector: list[float],
+        vectors: Dict[str, list[float]],
         exact: bool,
-        filters: dict
-    ) -> QueryResponse:
+        filters: dict,
+        depth: int,
+    ) -> List[QueryResponse]:
         """
-        Получение релевантных точек из коллекции
+        Получение релевантных точек из коллекции по нескольким векторам одним запросом.
+            Для каждого вектора возвращается не более depth кандидатов,
+            из payload берутся только поля для формирования результата
         Args:
-            vector_name (str): Название вектора для поиска
-            vector (list[float]): Вектор для поиска
+            vectors (Dict[str, list[float]]): Векторы для поиска по названиям
             exact (bool): Параметр, определяющий необходимость полного перебора точек
             filters (dict): Фильтры для сужения поиска
+            depth (int): Количество кандидатов по каждому вектору
         Returns:
-            hits (QueryResponse): Список найденных точек
+            hits (List[QueryResponse]): Списки найденных точек по векторам
         """
         query_filter = _build_filter(filters)
 
-        hits = await self._client.query_points(
+        requests = [
+            QueryRequest(
+                query=vector,
+                using=vector_name,
+                limit=depth,
+                filter=query_filter,
+                params=SearchParams(
+                    exact=exact,
+                    hnsw_ef=max(512, depth)
+                ),
+                with_payload=RESULT_PAYLOAD_FIELDS,
+            )
+            for vector_name, vector in vectors.items()
+        ]
+
+        hits = await self._client.query_batch_points(
             collection_name=self._collection,
-            query=vector,
-            using=vector_name,
-            limit=self._metadata.points_count if exact else 500,
-            query_filter=query_filter,
-            search_params=SearchParams(
-                exact=exact,
-                hnsw_ef=512
-            ),
+            requests=requests,
         )
 
         return hits
 
+    async def scroll_payload(
+        self,
+        fields: List[str],
+        batch_size: int = 1000,
+        scroll_filter: Optional[Filter] = None
+    ) -> AsyncIterator[List[Record]]:
+        """
+        Постраничное чтение выбранных полей payload точек коллекции
+        Args:
+            fields (List[str]): Поля payload
+            batch_size (int): Размер страницы
+            scroll_filter (Filter, None): Фильтр точек, None - все точки
+        Returns:
+            AsyncIterator[List[Record]]: Страницы точек
+        """
+        offset: Optional[int] = None
+
+        while True:
+            points, offset = await self._client.scroll(
+                collection_name=self._collection,
+                limit=batch_size,
+                offset=offset,
+                scroll_filter=scroll_filter,
+                with_payload=fields,
+                with_vectors=False
+            )
+
+            if points:
+                yield points
+
+            if offset is None:
+                break
+
+    @qdrant_retry()
+    async def update_payloads(self, payloads: Dict[int, dict]):
+        """
+        Частичное обновление payload точек (без перезаписи векторов)
+        Args:
+            payloads (Dict[int, dict]): Новые значения полей по id точек
+        """
+        if not payloads:
+            return
+
+        await self._client.batch_update_points(
+            collection_name=self._collection,
+            update_operations=[
+                SetPayloadOperation(
+                    set_payload=SetPayload(payload=payload, points=[point_id])
+                )
+                for point_id, payload in payloads.items()
+            ],
+        )
+
+        self._version += 1
+
+        log.info(f"Payload of {len(payloads)} points updated in collection - '{self._collection}'")
+
+    @qdrant_retry()
+    async def fetch_vectors(self, point_id: int) -> Optional[Dict[str, list[float]]]:
+        """
+        Получение сохраненных векторов точки по ее id
+        Args:
+            point_id (int): id точки (номер запроса)
+        Returns:
+            Optional[Dict[str, list[float]]]: Векторы по названиям или None, если точки нет в коллекции
+        """
+        points = await self._client.retrieve(
+            collection_name=self._collection,
+            ids=[point_id],
+            with_payload=False,
+            with_vectors=True,
+        )
+
+        if not points or not points[0].vector:
+            return None
+
+        return points[0].vector
+
+    @property
+    def version(self) -> int:
+        """Версия данных коллекции (для инвалидации кэша результатов)"""
+        return self._version
+
+    def bm25_index(self, field: str) -> BM25Index:
+        """
+        Получение BM25-индекса коллекции по полю
+        Args:
+            field (str): text/comments/full
+        Returns:
+            BM25Index: Индекс
+        """
+        return self._bm25.index(field)
+
     def metadata(self) -> dict:
         """
         Получение метаданных колелкции
@@ -1,8 +1,15 @@
+# Ключ метаданных, которым сервис моделей помечает запросы, отклоненные по дедлайну:
+# повтор с тем же таймаутом снова не успеет и только добавит нагрузку
+LOAD_SHED_METADATA_KEY = "load-shed"
+
+
 def is_retryable_grpc_error(exception):
 
     import grpc
 
     if isinstance(exception, grpc.aio.AioRpcError):
+        if any(key == LOAD_SHED_METADATA_KEY for key, _ in exception.trailing_metadata() or ()):
+            return False
         return exception.code() in {
             grpc.StatusCode.UNAVAILABLE,
             grpc.StatusCode.DEADLINE_EXCEEDED,
@@ -1,9 +1,7 @@
 # service/scorer.py
 from typing import List, Dict
 import numpy as np
-from rank_bm25 import BM25Okapi
-from search_service.text_processing.text_preparation import transforms_bm25
-from search_service.service.core.search_mode import SearchMode
+from search_service.infrastructure.db.vector_db.bm25_index import BM25Index
 import logging
 
 log = logging.getLogger(__name__)
@@ -14,14 +12,15 @@ class HybridScorer:
     def __call__(
         self,
         hits: Dict,
-        query_text: str,
-        search_mode: SearchMode,
+        query_tokens: List[str],
+        bm25_index: BM25Index,
         alpha: float
     ) -> List[Dict]:
         """
         Args
             hits (dict): Результаты поиска в векторной БД
-            query_text (str): текст запроса
+            query_tokens (List[str]): токены запроса, подготовленные для BM25
+            bm25_index (BM25Index): BM25-индекс коллекции по полю режима поиска
             alpha (float): коэффициент для гибридного поиска BM25 (0..1)
         Returns:
             List[Dict]: Отсортированыый список результатов поиска
@@ -36,17 +35,10 @@ class HybridScorer:
 
         log.debug(f"cosine_scores - {cosine_scores}")
 
-        # Получаем текст проблемы в зависимости от режима поиска
-        tokenized_docs = [
-            transforms_bm25(search_mode.extract_text(h))["text"].split()
-            for h in hits.values()
-        ]
+        log.debug(f'transforms text for bm25: {query_tokens}')
 
-        tokenized_query = transforms_bm25(query_text)["text"].split()
-        log.debug(f'transforms text for bm25: {tokenized_query}')
-
-        bm25 = BM25Okapi(tokenized_docs)
-        bm25_scores = bm25.get_scores(tokenized_query)
+        # Документы уже проиндексированы, считаем только по кандидатам
+        bm25_scores = bm25_index.get_scores(query_tokens, list(hits.keys()))
 
         # Нормализация для BM25
         bm25_norm = bm25_scores / (bm25_scores.max() + 1e-9)
@@ -1,19 +1,16 @@
 from typing import List, Dict, Any, Union, Optional
 from search_service.service.core.scorer import HybridScorer
 from search_service.service.core.search_mode import SearchMode
-from search_service.text_processing.text_preparation import \
-    transforms_embed, \
-    transforms_llm, \
-    transforms_comments
-from qdrant_client.models import PointStruct
+from qdrant_client.models import QueryResponse
 from search_service.service.utils.utils import timestamp_to_date
-import asyncio
+import json
 from search_service.config import Config
 import logging
 
 
 log = logging.getLogger(__name__)
 cfg = Config().data["service"]
+model_cfg = Config().data["model"]
 
 
 class SemanticSearchEngine:
@@ -22,47 +19,48 @@ class SemanticSearchEngine:
         self.container = container
         self.scorer = HybridScorer()
         self.threshold = cfg["searcher"]["threshold"]
+        self.candidate_depth = cfg["searcher"].get("candidate_depth") or 500
 
         self.SEARCH_MODES = SearchMode.get_vector_names
 
         self.products = cfg["products"]
 
-    async def generate_result(self, calc_result: list[dict]) -> List[Dict]:
+        self.text_executor = container.text_executor
+        self.embedding_cache = container.embedding_cache
+        self.result_cache = container.result_cache
+        self.model_version = model_cfg["embedding_cache"]["model_version"]
+
+    def generate_result(self, calc_result: list[dict], hits: Dict) -> List[Dict]:
         """
         Формирует итоговый результат поиска
         Args:
-            list[dict]: Результаты поиска
+            calc_result (list[dict]): Результаты поиска
+            hits (Dict): Объединенные точки с данными из payload
         Returns:
             list[dict]: Результат поиска с дополнительной информацией
         """
-
-        additional_data = await self.container.relational_db.fetch_additional_data(
-            {
-                "numbers": [cr["id"] for cr in calc_result]
-            }
-        )
-
         result = []
-        for cr, ad in zip(calc_result, additional_data):
+        for cr in calc_result:
             if cr["score"] < self.threshold:
                 continue
+            hit = hits[cr["id"]]
             result.append({
                 "id": str(cr["id"]),
                 "score": str(round(cr["score"] * 100)) + "%",
-                "responsible": ad["fio"],
-                "priority": ad["admission_prority"],
+                "responsible": hit["responsible"],
+                "priority": hit["priority"],
                 "registry_date": str(timestamp_to_date(cr["registry_date"])),
-                "url": "https://support.naumen.ru/sd/operator/#uuid:%s" % ad["servicecall"]
+                "url": "https://support.naumen.ru/sd/operator/#uuid:%s" % hit["servicecall"]
             })
 
         return result
 
     @staticmethod
-    def merge_hits(results: List[PointStruct]) -> Dict:
+    def merge_hits(results: List[QueryResponse]) -> Dict:
         """
         Объединение полученных результатов и их группировка по максимальному score
         Args:
-            results (List[PointStruct]): Результаты по векторам
+            results (List[QueryResponse]): Результаты по векторам
         Returns:
             Dict: Объединенные результаты
         """
@@ -77,45 +75,105 @@ class SemanticSearchEngine:
                     hits[pid] = {
                         "score": score,
                         "registry_date": point.payload.get("registry_date"),
-                        "text": point.payload.get("text"),
-                        "comments": point.payload.get("comments"),
+                        "responsible": point.payload.get("responsible"),
+                        "priority": point.payload.get("priority"),
+                        "servicecall": point.payload.get("servicecall"),
                     }
 
         return hits
 
-    async def _get_embedding(
+    async def _embed_query(self, text: str) -> Any:
+        """
+        Получение эмбеддинга подготовленного текста запроса через кэш
+        Args:
+            text (str): Текст после transforms_embed
+        Returns:
+            np.ndarray: эмбеддинг запроса
+        """
+        key = (text, "query", self.model_version)
+
+        embedding = self.embedding_cache.get(key)
+        if embedding is not None:
+            log.debug(f"Query embedding cache hit, {self.embedding_cache.stats()}")
+            return embedding
+
+        embedding = await self.container.model_client.embed(
+            texts=text,
+            prefix="query"
+        )
+        self.embedding_cache.set(key, embedding)
+
+        return embedding
+
+    async def _get_stored_embeddings(
+            self,
+            number: int,
+            product: str,
+            vector_names: List[str],
+    ) -> Optional[Dict[str, Any]]:
+        """
+        Получение сохраненных векторов запроса, если он уже есть в коллекции продукта
+        Args:
+            number (int): Номер запроса
+            product (str): Название продукта
+            vector_names (List[str]): Названия векторов для поиска
+        Returns:
+            Optional[Dict[str, Any]]: Векторы по названиям или None, если запрос не проиндексирован
+        """
+        stored = await self.container.vector_db.collection(product).fetch_vectors(number)
+        if not stored:
+            return None
+
+        # Если какого-то вектора нет (например, у запроса нет комментариев),
+        # используем суммаризацию или любой другой сохраненный вектор
+        fallback = stored.get("summary") or next(iter(stored.values()))
+
+        return {name: stored.get(name, fallback) for name in vector_names}
+
+    async def _get_embeddings(
             self,
             query: str,
-    ) -> Any:
+            product: str,
+            vector_names: List[str],
+    ) -> Dict[str, Any]:
         """
-        Метод для получения эмбеддинга запроса
+        Метод для получения эмбеддингов запроса по названиям векторов
         Args:
             query (str): Искомый текст или номер запроса
+            product (str): Название продукта
+            vector_names (List[str]): Названия векторов для поиска
         Returns:
-            np.ndarray: эмбеддинг запроса
+            Dict[str, Any]: эмбеддинги запроса по названиям векторов
         """
         # Если введен номер запроса, а не текст для поиска
         if query.isdigit():
+            stored = await self._get_stored_embeddings(int(query), product, vector_names)
+            if stored is not None:
+                log.info(f"Request {query} found in collection - {product}, using stored vectors")
+                return stored
+
+            log.info(f"Request {query} not found in collection - {product}, summarizing")
+
             req_data = await self.container.relational_db.fetch_request_data(
                 {"number": int(query)}
             )
             req_data = req_data[0]  # Берем первую и единствуенную строку
 
-            query = await self.container.model_client.make_summarize(
-                problem=transforms_llm(text=req_data["problem"])["text"],
-                comments=transforms_comments(text=req_data["comments"])["text"]
-            )
+            comments = None
+            if req_data["comments"]:
+                comments = await self.text_executor.run("comments", req_data["comments"])
 
-            return await self.container.model_client.embed(
-                texts=query,
-                prefix="query"
+            query = await self.container.summarization_orchestrator.summarize(
+                problem=await self.text_executor.run("llm", req_data["problem"]),
+                comments=comments,
             )
 
-        text = transforms_embed(text=query)["text"]
-        return await self.container.model_client.embed(
-            texts=text,
-            prefix="query"
-        )
+            embedding = await self._embed_query(query)
+            return {name: embedding for name in vector_names}
+
+        text = await self.text_executor.run("embed", query)
+        embedding = await self._embed_query(text)
+        return {name: embedding for name in vector_names}
 
     async def search(
             self,
@@ -147,43 +205,88 @@ class SemanticSearchEngine:
         if filters is None:
             filters = {}
 
-        embedding = await self._get_embedding(query)
+        key = (
+            query,
+            product,
+            search_mode.value,
+            limit,
+            alpha,
+            exact,
+            json.dumps(filters, sort_keys=True, ensure_ascii=False),
+            # При изменении коллекции старые записи перестают использоваться
+            self.container.vector_db.collection(product).version,
+        )
+
+        cached = self.result_cache.get(key)
+        if cached is not None:
+            log.info(f"Search result cache hit, {self.result_cache.stats()}")
+            return cached
+
+        result = await self._search(
+            query,
+            product,
+            search_mode,
+            limit=limit,
+            alpha=alpha,
+            exact=exact,
+            filters=filters,
+        )
+
+        # Кэшируем только успешные результаты
+        if isinstance(result, list):
+            self.result_cache.set(key, result)
+
+        return result
+
+    async def _search(
+            self,
+            query: str,
+            product: str,
+            search_mode: SearchMode,
+            *,
+            limit: int = 5,
+            alpha: float = 0.5,
+            exact: bool = True,
+            filters: Optional[Dict[str, Any]] = None
+    ) -> Union[Dict, List[Dict]]:
+        """
+        Поиск информации в векторной БД по введенному тексту (без кэша), параметры как у search
+        """
+        # Получаем результаты по векторам в коллекции, в зависимости от режима
+        vector_names = search_mode.get_vector_names()
+
+        embeddings = await self._get_embeddings(query, product, vector_names)
         try:
             # Берем коллекцию для продукта
             vector_db_collection = self.container.vector_db.collection(product)
 
-            # Получаем результаты по векторам в коллекции, в зависимости от режима
-            vector_names = search_mode.get_vector_names()
-
             log.info(f"Search text - {query} in product collection - {product}, vector names - {vector_names}")
 
-            search_tasks = [
-                vector_db_collection.fetch_embeddings(
-                    vector_name=name,
-                    vector=embedding,
-                    exact=exact,
-                    filters=filters
-                )
-                for name in vector_names
-            ]
-
-            # асинхронно делаем запросы для поиска
-            results = await asyncio.gather(*search_tasks)
+            # Один запрос к Qdrant по всем векторам режима
+            results = await vector_db_collection.fetch_embeddings(
+                vectors=embeddings,
+                exact=exact,
+                filters=filters,
+                depth=self.candidate_depth,
+            )
 
             hits = self.merge_hits(results)
 
             log.info(f"Result searching in vector db, found {len(hits)} points")
 
+            # Лемматизируется только запрос, документы уже проиндексированы
+            query_tokens = (await self.text_executor.run("bm25", query)).split()
+
             ranked = self.scorer(
                 hits=hits,
-                query_text=query,
-                search_mode=search_mode,
+                query_tokens=query_tokens,
+                bm25_index=vector_db_collection.bm25_index(search_mode.get_bm25_field()),
                 alpha=alpha,
             )
 
             log.info(f'Result searching: {ranked}')
 
-            return await self.generate_result(ranked[:limit])
+            return self.generate_result(ranked[:limit], hits)
         except ZeroDivisionError:
             return {"result": "data not found"}
         except Exception as e:
@@ -15,10 +15,11 @@ class SearchMode(Enum):
         if self is SearchMode.COMMENTS:
             return ["comments"]
 
-    def extract_text(self, hit):
-        if self == SearchMode.BASE:
-            return hit["text"]
-        elif self == SearchMode.COMMENTS:
-            return hit["comments"]
-        else:
-            return hit["text"] + " " + hit["comments"]
+    def get_bm25_field(self):
+        """Возвращает поле BM25-индекса коллекции в зависимости от режима поиска"""
+        if self is SearchMode.FULL:
+            return "full"
+        if self is SearchMode.BASE:
+            return "text"
+        if self is SearchMode.COMMENTS:
+            return "comments"
@@ -1,11 +1,16 @@
 # service/updater.py
-from typing import List, Dict
+from typing import List, Dict, Optional
 import asyncio
-from search_service.text_processing.text_preparation import \
-    transforms_embed, \
-    transforms_llm, \
-    transforms_comments
-from qdrant_client.models import PointStruct
+import numpy as np
+from qdrant_client.models import (
+    PointStruct,
+    Filter,
+    FieldCondition,
+    Range,
+    IsEmptyCondition,
+    IsNullCondition,
+    PayloadField,
+)
 from datetime import datetime, timedelta
 from collections import defaultdict
 from search_service.config import Config
@@ -17,11 +22,19 @@ cfg = Config().data["service"]["updater"]
 
 class DataUpdater:
     """Периодическое добавление новых данных"""
+
+    # Поля payload, которые могут меняться после сохранения точки
+    ENRICHMENT_FIELDS = ["responsible", "priority", "servicecall"]
+
     def __init__(self, container):
 
         self.container = container
+        self.text_executor = container.text_executor
         self.max_concurrent = cfg["max_concurrent"]
+        self.embed_batch_size = cfg["embed_batch_size"]
         self.time_window = cfg["time_window"] * 86_400
+        self.refresh_interval = cfg["refresh_interval"] * 60
+        self.refresh_window = (cfg.get("refresh_window") or 30) * 86_400
 
     async def run(self):
         # Первый запуск — сразу
@@ -79,60 +92,114 @@ class DataUpdater:
 
             await vector_db_collection.save_embeddings(points)
 
-    async def _get_embedding(self, row: dict) -> Dict:
+    async def _embed_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
         """
-        Получение эмбеддингов запроса по трем составляющим:
-            1) Оригинальный текст
-            2) Суммаризированный текст по описанию и комментариям
-            3) Комментарии
+        Получение эмбеддингов списка текстов пакетами по embed_batch_size текстов на запрос
         Args:
-            row (dict): запись с полями
+            texts (List[str]): Тексты
         Returns:
-            dict: эмбеддинги запроса
+            List[Optional[np.ndarray]]: Эмбеддинги текстов, None для текстов из пакета с ошибкой
         """
-        vectors = {}
-
-        try:
-            vectors["original"] = await self.container.model_client.embed(
-                texts=transforms_embed(text=row["problem"])["text"],
-                prefix="passage",
-            )
-        except Exception as e:
-            log.exception(f"Embedding failed for original text: {e}")
+        embeddings: List[Optional[np.ndarray]] = [None] * len(texts)
 
-        if row["comments"]:
-            comments = transforms_comments(text=row["comments"])["text"]
+        for start in range(0, len(texts), self.embed_batch_size):
+            batch = texts[start:start + self.embed_batch_size]
             try:
-                vectors["comments"] = await self.container.model_client.embed(
-                    texts=comments,
+                vectors = await self.container.model_client.embed_many(
+                    texts=batch,
                     prefix="passage",
+                    priority="bulk",
                 )
             except Exception as e:
-                log.exception(f"Embedding failed for comments: {e}")
-        else:
-            comments = None
+                log.exception(f"Embedding failed for batch of {len(batch)} texts: {e}")
+                continue
+            embeddings[start:start + len(batch)] = list(vectors)
 
+        return embeddings
+
+    async def _summarize(self,
+                         row: dict,
+                         problem: str,
+                         comments: Optional[str],
+                         semaphore: asyncio.Semaphore) -> Optional[str]:
+        """
+        Суммаризация запроса
+        Args:
+            row (dict): запись с полями
+            problem (str): Описание проблемы, подготовленное для LLM
+            comments (str, None): Комментарии, подготовленные для LLM
+            semaphore (asyncio.Semaphore): Общее ограничение одновременных запросов генерации
+                (чанков и итоговых суммаризаций всех строк)
+        Returns:
+            Optional[str]: Результат суммаризации, None при ошибке
+        """
         try:
-            problem_summary = await self.container.summarization_orchestrator.summarize(
-                problem=transforms_llm(text=row["problem"])["text"],
+            log.info(f"Summarize request - {row['number']}")
+            return await self.container.summarization_orchestrator.summarize(
+                problem=problem,
                 comments=comments,
-                max_concurrent=self.max_concurrent,
-            )
-            vectors["summary"] = await self.container.model_client.embed(
-                texts=problem_summary,
-                prefix="passage",
+                priority="bulk",
+                semaphore=semaphore,
             )
         except Exception as e:
-            log.exception(f"Embedding failed for comments: {e}")
+            log.exception(f"Summarization failed for request {row['number']}: {e}")
+            return None
 
-        if not vectors:
-            raise ValueError("Failed to get any embedding")
+    async def _get_embeddings(self, rows: List[dict]) -> List[Dict]:
+        """
+        Получение эмбеддингов запросов по трем составляющим:
+            1) Оригинальный текст
+            2) Суммаризированный текст по описанию и комментариям
+            3) Комментарии
+            Суммаризация выполняется по каждому запросу (до max_concurrent запросов генерации одновременно),
+            эмбеддинги каждой составляющей получаются пакетами сразу для всех запросов
+        Args:
+            rows (List[dict]): записи с полями
+        Returns:
+            List[Dict]: эмбеддинги запросов в порядке записей (пустой словарь, если не получено ни одного)
+        """
+        problems = await self.text_executor.run_batch("embed", [row["problem"] for row in rows])
+        llm_problems = await self.text_executor.run_batch("llm", [row["problem"] for row in rows])
+        comments = await self.text_executor.run_batch("comments", [row["comments"] or "" for row in rows])
+        comments = [text if row["comments"] else None for row, text in zip(rows, comments)]
+
+        # Строки и чанки длинных строк суммаризируются одновременно, сервис моделей генерирует их
+        # в общем батче. Общий семафор ограничивает число запросов генерации, а не строк
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+        summaries: List[Optional[str]] = await asyncio.gather(*(
+            self._summarize(row, problem, row_comments, semaphore)
+            for row, problem, row_comments in zip(rows, llm_problems, comments)
+        ))
+
+        vectors: List[Dict] = [{} for _ in rows]
+        for name, texts in (("original", problems), ("comments", comments), ("summary", summaries)):
+            indexes = [i for i, text in enumerate(texts) if text is not None]
+            log.info(f"Fetch {name} embeddings for {len(indexes)} requests")
+            embeddings = await self._embed_many([texts[i] for i in indexes])
+            for i, embedding in zip(indexes, embeddings):
+                if embedding is not None:
+                    vectors[i][name] = embedding
 
         return vectors
 
+    @staticmethod
+    def _enrichment_payload(row: dict) -> Dict:
+        """
+        Поля payload для результата поиска (ответственный, приоритет, ссылка)
+        Args:
+            row (dict): запись из реляционной БД
+        Returns:
+            dict: Поля payload
+        """
+        return {
+            "responsible": row["fio"],
+            "priority": row["admission_prority"],
+            "servicecall": row["servicecall"],
+        }
+
     async def _build_points(self, rows: List[dict]) -> dict:
         """
-        Асинхронное преобразование записей в PointStruct с параллельным получением эмбеддингов.
+        Асинхронное преобразование записей в PointStruct с пакетным получением эмбеддингов.
         Args:
             rows (List[dict]): список записей из БД
         Returns:
@@ -140,11 +207,17 @@ class DataUpdater:
         """
         product_points = defaultdict(list)
 
+        # Подготовка текста для BM25 сразу для всех строк (пакетная лемматизация)
+        bm25_texts = await self.text_executor.run_batch("bm25", [row["problem"] for row in rows])
+        bm25_comments = await self.text_executor.run_batch("bm25", [row["comments"] for row in rows])
+
+        rows_vectors = await self._get_embeddings(rows)
+
         count_missing_rows = 0
-        for row in rows:
+        for row, vectors, bm25_text, bm25_comment in zip(rows, rows_vectors, bm25_texts, bm25_comments):
             try:
-                log.info(f"Summarize and fetch embedding for request - {row['number']}")
-                vectors = await self._get_embedding(row)
+                if not vectors:
+                    raise ValueError("Failed to get any embedding")
 
                 product_points[row["product"]].append(
                     PointStruct(
@@ -156,6 +229,11 @@ class DataUpdater:
                             "client": row["client"],
                             "registry_date": row["registry_date"].timestamp(),
                             "date_end": row["date_end"].timestamp(),
+                            # Данные для результата поиска, чтобы не обращаться к реляционной БД
+                            **self._enrichment_payload(row),
+                            # Подготовленный для BM25 текст, чтобы не лемматизировать при поиске
+                            "bm25_text": bm25_text,
+                            "bm25_comments": bm25_comment,
                         }
                     )
                 )
@@ -206,6 +284,73 @@ class DataUpdater:
         for interval in date_intervals:
             await self._process_interval(interval)
 
+    def _refresh_filter(self) -> Filter:
+        """
+        Фильтр точек, поля которых еще могут измениться: запросы, завершенные
+            за последние refresh_window дней, и точки без полей (сохраненные до их появления)
+        Returns:
+            Filter: Фильтр для Qdrant
+        """
+        field = self.ENRICHMENT_FIELDS[0]
+        return Filter(should=[
+            FieldCondition(
+                key="date_end",
+                range=Range(gte=datetime.now().timestamp() - self.refresh_window)
+            ),
+            # Пустое, но не null поле - поля нет в payload
+            Filter(
+                must=[IsEmptyCondition(is_empty=PayloadField(key=field))],
+                must_not=[IsNullCondition(is_null=PayloadField(key=field))],
+            ),
+        ])
+
+    async def refresh_payloads(self):
+        """
+        Обновление изменяемых полей payload (ответственный, приоритет) из реляционной БД.
+            Читаются только точки, поля которых еще могут измениться (_refresh_filter),
+            перезаписываются только точки, у которых поля изменились
+        """
+        scroll_filter = self._refresh_filter()
+        for product, collection in self.container.vector_db.collections().items():
+            log.info(f"Refreshing payload for collection - {product}")
+            count_updated = 0
+
+            async for points in collection.scroll_payload(self.ENRICHMENT_FIELDS, scroll_filter=scroll_filter):
+                current = {p.id: p.payload or {} for p in points}
+
+                rows = await self.container.relational_db.fetch_additional_data(
+                    {"numbers": list(current)}
+                )
+
+                changed = {}
+                for row in rows:
+                    point_id = int(row["number"])
+                    payload = self._enrichment_payload(row)
+                    if any(current[point_id].get(k) != v for k, v in payload.items()):
+                        changed[point_id] = payload
+
+                await collection.update_payloads(changed)
+                count_updated += len(changed)
+
+            log.info(f"Payload refresh for collection - {product} finished, updated {count_updated} points")
+
+    async def background_refresher(self):
+        """
+        Фоновая задача для периодического обновления изменяемых полей payload.
+            Первое обновление выполняется сразу (заполняет поля у ранее сохраненных точек)
+        """
+        try:
+            while True:
+                try:
+                    await self.refresh_payloads()
+                except Exception as e:
+                    log.error(f"Error during payload refresh: {e}")
+                log.info(f"Next payload refresh in {self.refresh_interval} sec")
+                await asyncio.sleep(self.refresh_interval)
+        except asyncio.CancelledError:
+            log.info("Background payload refresher was cancelled.")
+            raise
+
     async def background_updater(self):
         """
         Фоновая задача для обновления данных. Засыпает  до 3 часов ночи каждого дня.
@@ -3,8 +3,11 @@ from nltk.corpus import stopwords
 from cleantext import clean
 import re
 from natasha import Doc, Segmenter, NewsEmbedding, NewsMorphTagger, MorphVocab
+from natasha.morph.lemma import normal_word
+from functools import lru_cache
 from sklearn.feature_extraction.text import TfidfVectorizer
-from typing import List
+from typing import List, Iterable, Generator
+from abc import ABC, abstractmethod
 
 
 # Проверка и тихая загрузка ресурсов
@@ -79,34 +82,185 @@ morph_vocab = MorphVocab()
 
 vectorizer = TfidfVectorizer()
 
+# Размер кэшей лемм (словарь поддержки небольшой и повторяющийся)
+LEMMA_CACHE_SIZE = 100_000
 
-class TextCompose:
+
+class Transform(ABC):
+    """Базовый класс преобразования текста"""
+
+    @abstractmethod
+    def __call__(self, text):
+        """Преобразование одного текста"""
+
+    def batch(self, texts: List) -> List:
+        """
+        Преобразование списка текстов
+        Args:
+            texts (List): Тексты
+        Returns:
+            List: Результаты преобразования в том же порядке
+        """
+        return [self(text)["text"] for text in texts]
+
+
+class TextCompose(Transform):
     """Основной класс для трансформаций"""
 
     def __init__(self, transforms):
-        self.transforms = transforms
+        self.transforms = self._merge_replacements(transforms)
+
+    @staticmethod
+    def _merge_replacements(transforms):
+        """Объединение подряд идущих ReplaceText в один (для сокращения проходов по тексту)"""
+        merged = []
+        for t in transforms:
+            if merged and type(t) is ReplaceText and type(merged[-1]) is ReplaceText:
+                merged[-1] = ReplaceText(merged[-1].replacements + t.replacements)
+            else:
+                merged.append(t)
+        return merged
 
     def __call__(self, text: str):
         for t in self.transforms:
             text = t(text)["text"]
         return {"text": text}
 
+    def batch(self, texts: List) -> List:
+        """
+        Применение пайплайна к списку текстов: каждое преобразование
+            обрабатывает сразу весь список (например, лемматизация выполняется пакетно)
+        Args:
+            texts (List): Тексты
+        Returns:
+            List: Результаты в том же порядке
+        """
+        texts = list(texts)
+        for t in self.transforms:
+            texts = t.batch(texts)
+        return texts
+
+    def stream(self, texts: Iterable, batch_size: int = 64) -> Generator:
+        """
+        Потоковое применение пайплайна: тексты обрабатываются пакетами по batch_size
+        Args:
+            texts (Iterable): Тексты
+            batch_size (int): Размер пакета
+        Returns:
+            Generator: Результаты в том же порядке
+        """
+        chunk = []
+        for text in texts:
+            chunk.append(text)
+            if len(chunk) >= batch_size:
+                yield from self.batch(chunk)
+                chunk = []
+        if chunk:
+            yield from self.batch(chunk)
+
+
+class TextLemmatization(Transform):
+    """
+    Приведение текста к одной лемме.
+        Леммы кэшируются: для слов, у которых все разборы дают нормальную форму,
+        совпадающую с самим словом, лемма не зависит от контекста, и если весь текст
+        состоит из таких слов, морфологическая разметка не выполняется
+    """
+
+    def __init__(self, cache_size: int = LEMMA_CACHE_SIZE):
+        """
+        Args:
+            cache_size (int): Размер кэшей лемм
+        """
+        self._unambiguous_lemma = lru_cache(cache_size)(self._resolve_unambiguous)
+        self._contextual_lemma = lru_cache(cache_size)(self._resolve_contextual)
+        self.calls = 0
+        self.fast_path = 0
 
-class TextLemmatization:
-    """Приведение текста к одной лемме"""
-
-    def __call__(self, text: str):
-        doc = Doc(text)
-        doc.segment(segmenter)
-        doc.tag_morph(morph_tagger)
-        for token in doc.tokens:
-            token.lemmatize(morph_vocab)
-        lemmas_text = [_.lemma for _ in doc.tokens]
-        text = ' '.join(lemmas_text)
-        return {"text": text}
+    @staticmethod
+    def _resolve_unambiguous(word: str):
+        """
+        Лемма слова, если она не зависит от разметки, иначе None.
+            Если подходящий разбор не найден, natasha возвращает само слово,
+            поэтому без разметки лемма известна, только когда все разборы дают это слово
+        """
+        word = normal_word(word)
+        if all(normal_word(form.normal) == word for form in morph_vocab(word)):
+            return word
+        return None
 
+    @staticmethod
+    def _resolve_contextual(word: str, pos: str, feats: tuple):
+        """Лемма слова с учетом морфологической разметки"""
+        return morph_vocab.lemmatize(word, pos, dict(feats))
 
-class RemoveStopWords:
+    def __call__(self, text: str):
+        return {"text": self.batch([text])[0]}
+
+    def batch(self, texts: List[str]) -> List[str]:
+        """
+        Лемматизация списка текстов: морфологическая разметка выполняется
+            одним вызовом для предложений всех текстов, где она нужна
+        Args:
+            texts (List[str]): Тексты
+        Returns:
+            List[str]: Лемматизированные тексты
+        """
+        docs = []
+        lemmas = []
+        for text in texts:
+            doc = Doc(text)
+            doc.segment(segmenter)
+            docs.append(doc)
+            lemmas.append([self._unambiguous_lemma(token.text) for token in doc.tokens])
+
+        self.calls += len(texts)
+
+        ambiguous = [idx for idx, doc_lemmas in enumerate(lemmas) if None in doc_lemmas]
+        self.fast_path += len(texts) - len(ambiguous)
+
+        if ambiguous:
+            sents = [sent for idx in ambiguous for sent in docs[idx].sents]
+            markups = morph_tagger.map([[token.text for token in sent.tokens] for sent in sents])
+            for sent, markup in zip(sents, markups):
+                for token, tagged in zip(sent.tokens, markup.tokens):
+                    token.pos = tagged.pos
+                    token.feats = tagged.feats
+
+            for idx in ambiguous:
+                doc_lemmas = lemmas[idx]
+                for pos, token in enumerate(docs[idx].tokens):
+                    if doc_lemmas[pos] is None:
+                        doc_lemmas[pos] = self._contextual_lemma(
+                            token.text,
+                            token.pos,
+                            tuple(sorted(token.feats.items()))
+                        )
+
+        return [' '.join(doc_lemmas) for doc_lemmas in lemmas]
+
+    def stats(self) -> dict:
+        """
+        Счетчики кэшей лемм (складываются по процессам в TextExecutor.stats)
+        Returns:
+            dict: Количество текстов, текстов без морфологической разметки,
+                попаданий, промахов и размер каждого кэша
+        """
+        unambiguous = self._unambiguous_lemma.cache_info()
+        contextual = self._contextual_lemma.cache_info()
+        return {
+            "calls": self.calls,
+            "fast_path": self.fast_path,
+            "unambiguous_hits": unambiguous.hits,
+            "unambiguous_misses": unambiguous.misses,
+            "unambiguous_size": unambiguous.currsize,
+            "contextual_hits": contextual.hits,
+            "contextual_misses": contextual.misses,
+            "contextual_size": contextual.currsize,
+        }
+
+
+class RemoveStopWords(Transform):
     """Удаление стоп-слов из текста"""
 
     def __call__(self, text: str):
@@ -116,19 +270,96 @@ class RemoveStopWords:
         return {"text": text_without_sw}
 
 
-class ReplaceText:
-    """Замена слов и символов"""
+# Метасимволы регулярных выражений (шаблон без них - обычная строка)
+REGEX_META = set(r'.^$*+?{}[]\|()')
+
+
+def is_literal(pattern: str, replacement: str) -> bool:
+    """Шаблон и замена не содержат спецсимволов регулярных выражений"""
+    return not (set(pattern) & REGEX_META) and '\\' not in replacement
+
+
+def starts_before_and_overlaps(first: str, second: str) -> bool:
+    """Может ли вхождение second начаться раньше вхождения first и пересечься с ним"""
+    if first in second[1:]:
+        return True
+    return any(
+        second.endswith(first[:k])
+        for k in range(1, min(len(first), len(second)))
+    )
+
+
+def can_merge(earlier: tuple, later: tuple) -> bool:
+    """
+    Можно ли выполнить две литеральные замены за один проход с тем же результатом,
+        что и последовательно:
+        - вхождение более поздней замены не может перехватить вхождение ранней
+        - результат ранней замены не может образовать вхождение поздней
+    """
+    pattern, replacement = earlier
+    later_pattern, _ = later
+    if starts_before_and_overlaps(pattern, later_pattern):
+        return False
+    if not replacement or set(replacement) & set(later_pattern):
+        return False
+    return True
+
+
+def compile_replacements(replacements: List) -> List:
+    """
+    Компиляция списка замен в минимальное число проходов.
+        Подряд идущие литеральные замены, не влияющие друг на друга,
+        объединяются в одно регулярное выражение с таблицей замен,
+        остальные компилируются по отдельности
+    Args:
+        replacements (List): Список пар (шаблон, замена) в порядке применения
+    Returns:
+        List: Список пар (скомпилированный шаблон, замена - строка или функция)
+    """
+    passes = []
+    group = []
+
+    def flush():
+        if not group:
+            return
+        if len(group) == 1:
+            passes.append((re.compile(group[0][0]), group[0][1]))
+        else:
+            table = {}
+            for pattern, replacement in group:
+                table.setdefault(pattern, replacement)
+            combined = re.compile('|'.join(re.escape(pattern) for pattern in table))
+            passes.append((combined, lambda m: table[m.group(0)]))
+        group.clear()
+
+    for pattern, replacement in replacements:
+        if not is_literal(pattern, replacement):
+            flush()
+            passes.append((re.compile(pattern), replacement))
+            continue
+
+        if not all(can_merge(prev, (pattern, replacement)) for prev in group):
+            flush()
+        group.append((pattern, replacement))
+
+    flush()
+    return passes
+
+
+class ReplaceText(Transform):
+    """Замена слов и символов (за минимальное число проходов по тексту)"""
 
     def __init__(self, replacements: List):
-        self.replacements = replacements
+        self.replacements = list(replacements)
+        self.passes = compile_replacements(self.replacements)
 
     def __call__(self, text: str):
-        for replacement in self.replacements:
-            text = re.sub(replacement[0], replacement[1], text)
+        for pattern, replacement in self.passes:
+            text = pattern.sub(replacement, text)
         return {"text": text}
 
 
-class CleanText:
+class CleanText(Transform):
     """Очистка текста с использованием библиотеки clean-text"""
 
     def __init__(self,
@@ -170,7 +401,7 @@ class CleanText:
         return {"text": text}
 
 
-class RemoveFirstWords:
+class RemoveFirstWords(Transform):
     """Удаление определенного текста в начале строки"""
 
     def __init__(self, words):
@@ -184,7 +415,7 @@ class RemoveFirstWords:
         return {"text": text}
 
 
-class LowerText:
+class LowerText(Transform):
     """Приведение текста к нижнему регистру"""
     def __call__(self, text):
         if not isinstance(text, str):
@@ -192,7 +423,7 @@ class LowerText:
         return {"text": text.lower()}
 
 
-class StripHTML:
+class StripHTML(Transform):
     def __init__(self):
         self.pattern = re.compile(r'<[^>]+>')
 
@@ -200,12 +431,12 @@ class StripHTML:
         return {"text": self.pattern.sub(' ', text)}
 
 
-class NormalizeWhitespace:
+class NormalizeWhitespace(Transform):
     def __call__(self, text: str):
         return {"text": re.sub(r'\s+', ' ', text).strip()}
 
 
-class SplitBlocks:
+class SplitBlocks(Transform):
     def __init__(self, separator="|||"):
         self.separator = separator
 
@@ -214,7 +445,7 @@ class SplitBlocks:
         return {"text": blocks}
 
 
-class JoinBlocks:
+class JoinBlocks(Transform):
     def __init__(self, separator="\n"):
         self.separator = separator
 
@@ -222,12 +453,12 @@ class JoinBlocks:
         return {"text": self.separator.join(blocks)}
 
 
-class FilterEmpty:
+class FilterEmpty(Transform):
     def __call__(self, blocks: List[str]):
         return {"text": [b for b in blocks if b.strip()]}
 
 
-class MapBlocks:
+class MapBlocks(Transform):
     def __init__(self, transform):
         self.transform = transform
 
@@ -239,8 +470,17 @@ class MapBlocks:
                 result.append(cleaned)
         return {"text": result}
 
+    def batch(self, texts: List[List[str]]) -> List[List[str]]:
+        """Обработка блоков всех текстов одним пакетом"""
+        flat = [b for blocks in texts for b in blocks]
+        cleaned = iter(self.transform.batch(flat))
+        return [
+            [c for c in (next(cleaned) for _ in blocks) if c]
+            for blocks in texts
+        ]
+
 
-class RemoveLogs:
+class RemoveLogs(Transform):
     def __init__(self, min_seq_len: int = 10):
         self.min_seq_len = min_seq_len
 
@@ -0,0 +1,175 @@
+from typing import Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, Executor
+from collections import Counter
+import multiprocessing
+import asyncio
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+# Пайплайны с лемматизацией natasha (тяжелые, выполняются в пуле процессов)
+HEAVY_PIPELINES = {"bm25"}
+
+
+def _init_worker():
+    """Загрузка моделей natasha и ресурсов nltk один раз при старте процесса-воркера"""
+    from search_service.text_processing import text_preparation  # noqa: F401
+
+
+def _lemma_stats(pipeline: str) -> Optional[Tuple[int, dict]]:
+    """Счетчики кэшей лемм процесса после выполнения пайплайна с лемматизацией"""
+    if pipeline not in HEAVY_PIPELINES:
+        return None
+    from search_service.text_processing.text_preparation import lemmatization
+    return os.getpid(), lemmatization.stats()
+
+
+def _apply(pipeline: str, text: str) -> Tuple[str, Optional[Tuple[int, dict]]]:
+    """
+    Применение пайплайна по названию (выполняется в воркере)
+    Args:
+        pipeline (str): Название пайплайна из PIPELINES
+        text (str): Исходный текст
+    Returns:
+        Tuple[str, Optional[Tuple[int, dict]]]: Обработанный текст и счетчики кэшей лемм процесса
+    """
+    from search_service.text_processing.text_preparation import PIPELINES
+    return PIPELINES[pipeline](text=text)["text"], _lemma_stats(pipeline)
+
+
+def _apply_batch(pipeline: str, texts: List[str]) -> Tuple[List[str], Optional[Tuple[int, dict]]]:
+    """
+    Пакетное применение пайплайна по названию (выполняется в воркере)
+    Args:
+        pipeline (str): Название пайплайна из PIPELINES
+        texts (List[str]): Исходные тексты
+    Returns:
+        Tuple[List[str], Optional[Tuple[int, dict]]]: Обработанные тексты и счетчики кэшей лемм процесса
+    """
+    from search_service.text_processing.text_preparation import PIPELINES
+    return PIPELINES[pipeline].batch(texts), _lemma_stats(pipeline)
+
+
+class TextExecutor:
+    """
+    Выполнение пайплайнов обработки текста вне event loop:
+        легкие преобразования - в пуле потоков,
+        лемматизация natasha - в пуле процессов
+    """
+    def __init__(self,
+                 thread_workers: int,
+                 process_workers: int = 0):
+        """
+        Args:
+            thread_workers (int): Количество потоков для легких преобразований
+            process_workers (int): Количество процессов для лемматизации, 0 - использовать пул потоков
+        """
+        self._threads = ThreadPoolExecutor(
+            max_workers=thread_workers,
+            thread_name_prefix="text"
+        )
+
+        self._processes: Optional[ProcessPoolExecutor] = None
+        if process_workers:
+            self._processes = ProcessPoolExecutor(
+                max_workers=process_workers,
+                # fork из процесса с запущенными потоками может унаследовать захваченные блокировки
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker
+            )
+
+        # Последние счетчики кэшей лемм каждого процесса (pid -> счетчики)
+        self._lemma_stats: Dict[int, dict] = {}
+
+        log.info(f"Text executor started: threads={thread_workers}, processes={process_workers}")
+
+    def _executor(self, pipeline: str) -> Executor:
+        if pipeline in HEAVY_PIPELINES and self._processes is not None:
+            return self._processes
+        return self._threads
+
+    async def run(self, pipeline: str, text: Optional[str]) -> str:
+        """
+        Асинхронное применение пайплайна к тексту
+        Args:
+            pipeline (str): Название пайплайна (bm25/embed/llm/comments)
+            text (str, None): Исходный текст
+        Returns:
+            str: Обработанный текст (пустая строка для пустого текста)
+        """
+        if not text:
+            return ""
+
+        loop = asyncio.get_running_loop()
+        processed, lemma_stats = await loop.run_in_executor(self._executor(pipeline), _apply, pipeline, text)
+        self._record(lemma_stats)
+        return processed
+
+    async def run_batch(self, pipeline: str, texts: List[Optional[str]]) -> List[str]:
+        """
+        Асинхронное пакетное применение пайплайна к списку текстов одной задачей пула
+        Args:
+            pipeline (str): Название пайплайна (bm25/embed/llm/comments)
+            texts (List[str, None]): Исходные тексты
+        Returns:
+            List[str]: Обработанные тексты (пустая строка для пустых текстов)
+        """
+        result = [""] * len(texts)
+        filled = [idx for idx, text in enumerate(texts) if text]
+        if not filled:
+            return result
+
+        loop = asyncio.get_running_loop()
+        processed, lemma_stats = await loop.run_in_executor(
+            self._executor(pipeline),
+            _apply_batch,
+            pipeline,
+            [texts[idx] for idx in filled]
+        )
+        self._record(lemma_stats)
+
+        for idx, text in zip(filled, processed):
+            result[idx] = text
+        return result
+
+    def _record(self, lemma_stats: Optional[Tuple[int, dict]]):
+        """Сохранение счетчиков кэшей лемм процесса, выполнившего пайплайн"""
+        if lemma_stats is not None:
+            pid, stats = lemma_stats
+            self._lemma_stats[pid] = stats
+
+    def stats(self) -> Dict:
+        """
+        Метрики кэшей лемм, суммарно по процессам, выполнявшим лемматизацию
+        Returns:
+            Dict: Количество текстов, доля текстов без морфологической разметки,
+                доля попаданий и размер кэшей лемм
+        """
+        totals = Counter()
+        for stats in self._lemma_stats.values():
+            totals.update(stats)
+
+        def rate(part, total):
+            return round(part / total, 4) if total else 0.0
+
+        return {
+            "name": "lemmatization",
+            "processes": len(self._lemma_stats),
+            "calls": totals["calls"],
+            "fast_path_rate": rate(totals["fast_path"], totals["calls"]),
+            "unambiguous_hit_rate": rate(
+                totals["unambiguous_hits"], totals["unambiguous_hits"] + totals["unambiguous_misses"]
+            ),
+            "unambiguous_size": totals["unambiguous_size"],
+            "contextual_hit_rate": rate(
+                totals["contextual_hits"], totals["contextual_hits"] + totals["contextual_misses"]
+            ),
+            "contextual_size": totals["contextual_size"],
+        }
+
+    def shutdown(self):
+        """Остановка пулов"""
+        self._threads.shutdown(wait=False, cancel_futures=True)
+        if self._processes is not None:
+            self._processes.shutdown(wait=False, cancel_futures=True)
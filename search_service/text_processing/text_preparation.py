@@ -1,5 +1,7 @@
 from search_service.text_processing import TransformsText as TT
 
+# Лемматизация пайплайна bm25, метрики кэшей лемм собирает TextExecutor
+lemmatization = TT.TextLemmatization()
 
 transforms_bm25 = TT.TextCompose([
     TT.RemoveFirstWords([r'Erudite']),
@@ -19,7 +21,7 @@ transforms_bm25 = TT.TextCompose([
     TT.ReplaceText([
                     (r'[^а-яА-Яa-zA-Z0-9\s\-]', ''),
     ]),
-    TT.TextLemmatization(),
+    lemmatization,
     TT.RemoveStopWords(),
     # Убираем длинные слова, на английском, которые слиплись
     TT.ReplaceText([
@@ -100,8 +102,8 @@ def preparation_list(texts: list[str]) -> tuple[list[list[str]], list[str]]:
             - первый — токены, подготовленные для BM25;
             - второй — тексты, подготовленные для BERT.
     """
-    tokens_bm25 = [transforms_bm25(text=text)["text"].split() for text in texts]
-    texts_bert = [transforms_embed(text=text)["text"] for text in texts]
+    tokens_bm25 = [text.split() for text in transforms_bm25.batch(texts)]
+    texts_bert = transforms_embed.batch(texts)
     return tokens_bm25, texts_bert
 
 
@@ -120,3 +122,12 @@ def preparation_str(text: str) -> tuple[list[str], str]:
     text_bert = transforms_embed(text=text)["text"]
 
     return tokens_bm25, text_bert
+
+
+# Пайплайны по названиям (для выполнения в пуле потоков/процессов)
+PIPELINES = {
+    "bm25": transforms_bm25,
+    "embed": transforms_embed,
+    "llm": transforms_llm,
+    "comments": transforms_comments,
+}